@@ -0,0 +1,310 @@
+"""Runtime on a single asyncio event loop (--runtime asyncio).
+
+Input descriptors, the gRPC and HTTP servers, MQTT and API refresh timers
+all run on the loop. Blocking work stays off it: SDL calls on the
+dispatcher thread, API fetches on a small executor.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+import paho.mqtt.client as mqtt
+from aiohttp import web
+
+from . import latency
+from .client_api import instances
+from .controls.raw_controls import EventQueue
+from .exceptions import PlaybackBusy
+from .main import add_services
+from .main import setup_mqtt
+from .main import SoundboardServicer
+from .mqtt import MQTT
+from .signals import api_created
+import proto_pb2
+
+logger = logging.getLogger("soundboard.aio")
+
+
+class AsyncControl:
+    """ControlHandler.poll_buffered waiting on the loop instead of a selector.
+
+    Chords are still resolved by ControlHandler.collect, only wait_raw differs.
+    """
+
+    def __init__(self, control, loop):
+        """:type control: soundboard.controls.ControlHandler"""
+        self.control = control
+        self.loop = loop
+        self.ready = asyncio.Event()
+        self.registered = {}
+
+    def _sync_readers(self):
+        for controller in self.control.controllers:
+            fd = controller.fileno()
+            current = (fd, controller.generation)
+            previous = self.registered.get(controller)
+            if previous == current:
+                continue
+            if previous and previous[0] is not None:
+                self.loop.remove_reader(previous[0])
+            if fd is not None:
+                self.loop.add_reader(fd, self.ready.set)
+            self.registered[controller] = current
+
+        return any(fd is None for fd, _ in self.registered.values())
+
+    def close(self):
+        for fd, _ in self.registered.values():
+            if fd is not None:
+                self.loop.remove_reader(fd)
+        self.registered.clear()
+
+    async def wait_raw(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        events = self.control.poll_raw()
+        while not events:
+            polled = self._sync_readers()
+            wait = None if deadline is None else deadline - time.monotonic()
+            if wait is not None and wait <= 0:
+                break
+            if polled:
+                wait = self.control.poll_interval if wait is None else min(wait, self.control.poll_interval)
+            self.ready.clear()
+            try:
+                await asyncio.wait_for(self.ready.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            events = self.control.poll_raw()
+        return events
+
+    async def poll_buffered(self, buffer_time, timeout=0):
+        chord = self.control.collect(buffer_time, timeout)
+        try:
+            wait = next(chord)
+            while True:
+                wait = chord.send(await self.wait_raw(wait))
+        except StopIteration as done:
+            return done.value
+
+
+class AsyncApiManager:
+    """ApiManager on loop timers, one per cached client."""
+
+    def __init__(self, loop, instances=instances, workers=4):
+        self.loop = loop
+        self.instances = instances
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="api")
+        self.timers = {}
+        self.in_flight = set()
+        api_created.connect(self.add)
+
+    def add(self, client, **kwargs):
+        # clients are created on loader threads too
+        self.loop.call_soon_threadsafe(self._schedule, client)
+
+    def _schedule(self, client):
+        if not client.cacheme or client in self.in_flight:
+            return
+        timer = self.timers.pop(client, None)
+        if timer:
+            timer.cancel()
+        delay = max(client.next_update - time.time(), 0)
+        self.timers[client] = self.loop.call_later(delay, self._submit, client)
+
+    def _submit(self, client):
+        self.timers.pop(client, None)
+        self.in_flight.add(client)
+        self.loop.create_task(self._fetch(client))
+
+    async def _fetch(self, client):
+        try:
+            await self.loop.run_in_executor(self.pool, client.update)
+        except Exception as e:
+            logger.exception("api exception: %s", e)
+            client.backoff()
+        finally:
+            self.in_flight.discard(client)
+            self._schedule(client)
+
+    def start(self):
+        for client in list(self.instances.values()):
+            self._schedule(client)
+
+    def stop(self):
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+        self.pool.shutdown(wait=False)
+
+
+class AsyncMQTT(MQTT):
+    """paho client driven by loop readers and writers instead of loop_start."""
+
+    reconnect_interval = 5
+
+    def __init__(self, loop, *args, **kwargs):
+        self.loop = loop
+        super().__init__(*args, **kwargs)
+
+    def _setup_mqtt(self):
+        self._create_client()
+        client = self.mqtt_client
+        client.on_socket_open = lambda c, userdata, sock: self._call(self.loop.add_reader, sock, c.loop_read)
+        client.on_socket_close = lambda c, userdata, sock: self._call(self.loop.remove_reader, sock)
+        client.on_socket_register_write = lambda c, userdata, sock: self._call(self.loop.add_writer, sock, c.loop_write)
+        client.on_socket_unregister_write = lambda c, userdata, sock: self._call(self.loop.remove_writer, sock)
+        client.connect_async(self.server, 1883, 60)
+        self.task = self.loop.create_task(self.misc())
+
+    def _call(self, func, *args):
+        # publishing happens on the dispatcher thread too
+        try:
+            on_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            func(*args)
+        else:
+            self.loop.call_soon_threadsafe(func, *args)
+
+    async def misc(self):
+        while True:
+            if self.mqtt_client.loop_misc() == mqtt.MQTT_ERR_NO_CONN:
+                try:
+                    self.mqtt_client.reconnect()
+                except OSError as e:
+                    logger.warning("mqtt connection to %s failed: %s", self.server, e)
+                    await asyncio.sleep(self.reconnect_interval)
+                    continue
+            await asyncio.sleep(1)
+
+    def stop(self):
+        self.task.cancel()
+        self.mqtt_client.disconnect()
+
+
+class AsyncSoundboardServicer(SoundboardServicer):
+    async def Index(self, request, context):
+        return super().Index(request, context)
+
+    async def GetSounds(self, request, context):
+        return super().GetSounds(request, context)
+
+    async def Play(self, request, context):
+        sound_set = self.board.shared_online.get(request.set_name)
+        sound = sound_set.sounds[request.sound_name]
+        try:
+            self.board.dispatcher.play(sound)
+        except PlaybackBusy:
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "too many sounds queued")
+        return proto_pb2.PlayResponse()
+
+
+routes = web.RouteTableDef()
+
+
+@routes.get("/")
+async def index(request):
+    board = request.app["board"]
+    return web.json_response({"sound_sets": list(board.shared_online)})
+
+
+@routes.get("/sound_set/{set_name}")
+async def sound_set(request):
+    board = request.app["board"]
+    sound_set = board.shared_online.get(request.match_info["set_name"])
+    if not sound_set:
+        return web.json_response(">:")
+    return web.json_response({"sounds": [s.name for s in sound_set.sounds.values()]})
+
+
+@routes.get("/traces")
+async def traces(request):
+    return web.json_response({"traces": latency.traces()})
+
+
+@routes.post(r"/remote-input/{btn:\d+}/{state:\d+}")
+async def remote(request):
+    request.app["queue"].put((int(request.match_info["btn"]), int(request.match_info["state"])))
+    return web.Response()
+
+
+@routes.get("/play/{set_name}/{sound_name}")
+async def play(request):
+    board = request.app["board"]
+    sound_set = board.shared_online.get(request.match_info["set_name"])
+    sound = sound_set.sounds[request.match_info["sound_name"]]
+    try:
+        board.dispatcher.play(sound)
+    except PlaybackBusy:
+        return web.json_response({"error": "too many sounds queued"}, status=429)
+    return web.json_response(None)
+
+
+def create_app(board):
+    app = web.Application()
+    app["board"] = board
+    app["queue"] = EventQueue()
+    app.add_routes(routes)
+    return app
+
+
+async def serve_http(board, settings):
+    runner = web.AppRunner(create_app(board))
+    await runner.setup()
+    await web.TCPSite(runner, settings.http_ip, settings.http_port).start()
+    return runner
+
+
+async def serve_grpc(board):
+    server = grpc.aio.server()
+    add_services(server, AsyncSoundboardServicer(board))
+    await server.start()
+    return server
+
+
+async def run_board(board, control):
+    """Board.run on the loop, dispatching stays on the dispatcher thread."""
+    board.start()
+    buffers = board.buffers
+    is_active = False
+    try:
+        while board.running:
+            buttons = await control.poll_buffered(buffers[is_active], timeout=1)
+            is_active = board.on_poll(buttons)
+    finally:
+        control.close()
+        board.shutdown()
+
+
+async def serve(board, settings):
+    loop = asyncio.get_running_loop()
+    api_created.disconnect(board.api_manager.add)
+    board.api_manager = AsyncApiManager(loop, workers=settings.api_workers)
+
+    grpc_server = await serve_grpc(board)
+    http = await serve_http(board, settings) if settings.http else None
+    mqtt_client = None
+    if settings.mqtt:
+        mqtt_client = AsyncMQTT(
+            loop,
+            path=settings.mqtt_path,
+            login=settings.mqtt_login,
+            password=settings.mqtt_password,
+        )
+        setup_mqtt(board, mqtt_client)
+
+    try:
+        await run_board(board, AsyncControl(board.control, loop))
+    finally:
+        if mqtt_client:
+            mqtt_client.stop()
+        if http:
+            await http.cleanup()
+        await grpc_server.stop(None)
+
+
+def run(board, settings):
+    asyncio.run(serve(board, settings))
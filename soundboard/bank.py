@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from ctypes import c_ubyte
+from typing import NamedTuple
+
+from sdl2 import sdlmixer
+
+from .config import settings
+from .formats import EXTENSIONS
+from .manifest import file_hash
+from .types import audio_spec
+
+logger = logging.getLogger("soundboard.bank")
+
+MAGIC = b"SBANK\0"
+VERSION = 2
+ALIGNMENT = 16
+# magic, version, frequency, format, channels, index size
+header = struct.Struct("<6sHIHHQ")
+
+
+class bank_entry(NamedTuple):
+    offset: int
+    length: int
+    duration: float
+    # sha1 of the source file, as in the manifest
+    source: str
+
+
+def _align(offset):
+    return offset + (-offset % ALIGNMENT)
+
+
+def build(directory, path, mixer):
+    """Converts every sample under directory to the mixer's format and packs them into path."""
+    spec = mixer.spec()
+    index = {}
+    offsets = {}
+    blobs = []
+    offset = 0
+
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if not name.lower().endswith(EXTENSIONS):
+                continue
+            fs_path = os.path.join(root, name)
+            chunk = sdlmixer.Mix_LoadWAV(fs_path.encode("utf-8"))
+            if not chunk:
+                logger.warning("skipping %s: %s", fs_path, sdlmixer.Mix_GetError())
+                continue
+            pcm = mixer.pcm(chunk)
+            sdlmixer.Mix_FreeChunk(chunk)
+
+            digest = hashlib.sha1(pcm).digest()
+            if digest not in offsets:
+                offsets[digest] = offset
+                blobs.append((offset, pcm))
+                offset = _align(offset + len(pcm))
+            duration = len(pcm) / (spec.frame_size * spec.frequency)
+            relative = os.path.relpath(fs_path, directory)
+            index[relative] = bank_entry(offsets[digest], len(pcm), duration, file_hash(fs_path))
+
+    index_data = json.dumps(index).encode("utf-8")
+    data_start = _align(header.size + len(index_data))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(header.pack(MAGIC, VERSION, *spec, len(index_data)))
+        file.write(index_data)
+        for blob_offset, pcm in blobs:
+            file.seek(data_start + blob_offset)
+            file.write(pcm)
+    os.replace(tmp_path, path)
+    logger.info("packed %d samples (%d unique) into %s", len(index), len(blobs), path)
+    return len(index)
+
+
+class Bank:
+    """Read-only memory mapping of a sample bank.
+
+    Chunks point straight into the mapping, so samples are never copied and
+    processes using the same bank share its pages.
+    """
+
+    def __init__(self, path, directory):
+        self.path = path
+        self.directory = os.path.realpath(directory)
+        with open(path, "rb") as file:
+            # copy-on-write, ctypes needs a writable buffer but nothing is written
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        magic, version, *spec, index_size = header.unpack_from(self.map)
+        if (magic, version) != (MAGIC, VERSION):
+            raise ValueError("%s is not a sample bank" % path)
+        self.spec = audio_spec(*spec)
+        index_end = header.size + index_size
+        index = json.loads(self.map[header.size:index_end].decode("utf-8"))
+        data_start = _align(index_end)
+        self.index = {
+            sample: bank_entry(data_start + offset, *entry)
+            for sample, (offset, *entry) in index.items()
+        }
+
+    @classmethod
+    def open(cls, path, directory, spec):
+        """Returns None if there is no usable bank for the current output format."""
+        if not path or not directory:
+            return None
+        try:
+            bank = cls(path, directory)
+        except (OSError, ValueError) as e:
+            logger.warning("not using sample bank %s: %s", path, e)
+            return None
+        if bank.spec != spec:
+            logger.warning("sample bank %s was built for %s, mixer uses %s", path, bank.spec, spec)
+            return None
+        return bank
+
+    def lookup(self, path, source):
+        """
+        :param source: sha1 of the file now, samples changed since the bank was built are not used
+        """
+        relative = os.path.relpath(os.path.realpath(path), self.directory)
+        entry = self.index.get(relative)
+        if entry and entry.source != source:
+            logger.warning("%s changed since sample bank %s was built, loading the file", path, self.path)
+            return None
+        return entry
+
+    def load(self, entry):
+        """:rtype: (chunk, buffer the chunk points into)"""
+        buffer = (c_ubyte * entry.length).from_buffer(self.map, entry.offset)
+        return sdlmixer.Mix_QuickLoad_RAW(buffer, entry.length), buffer
+
+
+def main():
+    from .mixer import SDLMixer
+
+    logging.basicConfig(level=logging.INFO)
+    settings.from_files(cfg="yaml", verbose=True)
+    settings.from_args(sys.argv[1:])
+    if not settings.sample_bank:
+        sys.exit("--sample_bank is required")
+    build(settings.wav_directory, settings.sample_bank, SDLMixer())
+
+
+if __name__ == "__main__":
+    main()
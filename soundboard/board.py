@@ -1,12 +1,25 @@
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import perf_counter
 
+from . import latency
 from .client_api import ApiManager
+from .client_api import response_cache
+from .config import YAMLConfig
 from .controls import ControlHandler
+from .controls import chords
+from .dispatcher import Dispatcher
 from .enums import ModifierTypes
+from .enums import Priority
+from .exceptions import PlaybackBusy
 from .mixer import SDLMixer
 from .sounds import SoundFactory
 from .sounds import SoundSet
 from .types import states_tuple
+from .utils import bitmask
+from .utils import bits
 
 logger = logging.getLogger("soundboard.board")
 
@@ -17,21 +30,34 @@ class Board:
         :type settings: soundboard.config.settings
         """
         self.settings = settings
-        self.mixer = SDLMixer()
+        self.mixer = self.create_mixer(settings)
         self.sound_factory = SoundFactory(
             mixer=self.mixer,
             directory=settings["wav_directory"],
         )
         self._dankness = False
 
-        self.api_manager = ApiManager()
+        response_cache.open(settings.api_cache_path, settings.api_cache_max_age)
+        self.api_manager = ApiManager(workers=settings.api_workers)
+        self.dispatcher = Dispatcher(
+            max_pending=settings.play_queue_size, coalesce=settings.play_coalesce / 1000,
+        )
         self.combinations = {}
+        self.by_button = defaultdict(list)
         self.shared_online = {}
-        self.control = ControlHandler()
+        self.control = ControlHandler(chords.from_settings(settings, complete=self.chord_complete))
         self.running = False
         self.active_sound_set = None
         self.board_state = {"allow_dank_memes": False}
 
+    @staticmethod
+    def create_mixer(settings):
+        if settings.mixer == "software":
+            from .softmixer import SoftwareMixer  # numpy is optional
+
+            return SoftwareMixer.from_settings()
+        return SDLMixer()
+
     def on_dankness(self, topic, payload):
         allow = {b"safe": False, b"engaged": True}[payload]
         self.dankness = allow
@@ -47,7 +73,10 @@ class Board:
         self.board_state["allow_dank_memes"] = new_dankness
         mode = "engaged" if new_dankness else "disengaged"
         sound = self.sound_factory.vox("may may mode %s" % mode)
-        sound.play()
+        try:
+            self.dispatcher.submit(sound.play, Priority.remote, sound)
+        except PlaybackBusy:
+            logger.warning("playback busy, not announcing meme mode")
 
     def register_joystick(self, joystick):
         """:type joystick: soundboard.controls.Joystick"""
@@ -66,22 +95,66 @@ class Board:
         if ModifierTypes.http in sound_set.modifiers:
             self.register_on_http(sound_set, sound_set.name)
 
+    def load_sound_sets(self, yamlfiles, workers=0):
+        """Parses and decodes sound sets on a thread pool, registers them in order."""
+        start = perf_counter()
+
+        def load(yamlfile):
+            started = perf_counter()
+            cfg = YAMLConfig(yamlfile, settings=self.settings)
+            parsed = perf_counter()
+            sound_set = SoundSet(config=cfg, base_sound_factory=self.sound_factory)
+            return sound_set, parsed - started, perf_counter() - parsed
+
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                loaded = list(pool.map(load, yamlfiles))
+        else:
+            loaded = [load(yamlfile) for yamlfile in yamlfiles]
+
+        registering = perf_counter()
+        for sound_set, _, _ in loaded:
+            self.register_sound_set(sound_set=sound_set)
+
+        manifest = self.mixer.manifest
+        manifest.prune()
+        manifest.save()
+        for paths in manifest.duplicates():
+            logger.info("identical samples share a chunk: %s", ", ".join(paths))
+
+        logger.info(
+            "loaded %d sound sets in %.3fs: parse %.3fs, decode %.3fs (summed over workers), register %.3fs",
+            len(loaded),
+            perf_counter() - start,
+            sum(parse for _, parse, _ in loaded),
+            sum(decode for _, _, decode in loaded),
+            perf_counter() - registering,
+        )
+
+    def chord_complete(self, clicks: int, held: int) -> bool:
+        sound_set = self.combinations.get(held)
+        return sound_set is not None and clicks in sound_set.final_combinations
+
     def register_on_http(self, sound_set: SoundSet, endpoint: str):
         self.shared_online[endpoint] = sound_set
 
     def register_on_keys(self, sound_set: SoundSet, keys: list):
-        if keys in self.combinations:
+        mask = bitmask(keys)
+        if mask in self.combinations:
             raise ValueError("combo %s is occupied" % list(keys))
-        self.combinations[frozenset(keys)] = sound_set
+        self.combinations[mask] = sound_set
+        for button in sound_set.by_button:
+            self.by_button[button].append(sound_set)
 
     def on_buttons(self, buttons: states_tuple):
         """:type buttons: states_tuple"""
+        latency.mark("dispatched")
         logger.debug(buttons)
         pushed, held, released = buttons.pushed, buttons.held, buttons.released
         self.play_sounds(pushed, held)
         self.finish_sounds(released)
 
-    def play_sounds(self, pushed, held):
+    def play_sounds(self, pushed: int, held: int):
 
         if held not in self.combinations:
             return
@@ -102,27 +175,50 @@ class Board:
         except Exception as e:
             logger.exception(e)
 
-    def finish_sounds(self, released: frozenset):
-        for sound_set in self.combinations.values():
-            sound_set.stop(released)
+    def finish_sounds(self, released: int):
+        sound_sets = []
+        for button in bits(released):
+            for sound_set in self.by_button.get(button, ()):
+                if sound_set not in sound_sets:
+                    sound_sets.append(sound_set)
 
-    def run(self):
-        self.running = True
-        self.api_manager.start()
+        for sound_set in sound_sets:
+            sound_set.stop(released)
 
-        buffers = {
+    @property
+    def buffers(self):
+        """Chord buffer in seconds, by whether the previous poll had buttons."""
+        return {
             False: self.settings.button_poll_buffer / 100,
             True: self.settings.button_poll_active_buffer / 100,
         }
-        is_active = False
 
-        while self.running:
-            buttons = self.control.poll_buffered(buffers[is_active])
-            if not any(buttons):
-                is_active = False
-                continue
+    def on_poll(self, buttons: states_tuple) -> bool:
+        """Hands polled buttons to the dispatcher, returns whether there were any."""
+        if not any(buttons):
+            return False
+        if self.control.first_event is None:
+            # the deferred release of a click, there is no input to time
+            latency.current.set(None)
+        else:
+            latency.start(self.control.first_event).mark("resolved")
+        self.dispatcher.submit(partial(self.on_buttons, buttons))
+        return True
+
+    def start(self):
+        self.running = True
+        self.api_manager.start()
 
-            is_active = True
-            self.on_buttons(buttons)
+    def shutdown(self):
+        self.mixer.manifest.save()
+        self.api_manager.stop()
+        self.dispatcher.stop()
 
-        self.api_manager._stop()
+    def run(self):
+        self.start()
+        buffers = self.buffers
+        is_active = False
+        while self.running:
+            buttons = self.control.poll_buffered(buffers[is_active], timeout=1)
+            is_active = self.on_poll(buttons)
+        self.shutdown()
@@ -0,0 +1,102 @@
+import logging
+from collections import Counter
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import RLock
+
+logger = logging.getLogger("soundboard.cache")
+
+
+class SampleCache:
+    """LRU cache of loaded chunks bounded by their size in bytes.
+
+    Entries are chunk_tuples, ``load`` is called on a miss, ``free`` when an
+    entry is evicted. Entries for which ``in_use`` returns True (chunks that
+    are still playing) and entries held with ``use`` are never evicted.
+    """
+
+    def __init__(self, budget, free=None, in_use=None):
+        self.budget = budget
+        self.free = free
+        self.in_use = in_use
+        self.size = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.pins = Counter()
+        self.lock = RLock()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, load):
+        return self._get(key, load)
+
+    @contextmanager
+    def use(self, key, load):
+        """Entry of key, other threads can't evict it until the block ends."""
+        entry = self._get(key, load, pin=True)
+        try:
+            yield entry
+        finally:
+            with self.lock:
+                self.pins[key] -= 1
+                if not self.pins[key]:
+                    del self.pins[key]
+
+    def _get(self, key, load, pin=False):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                if pin:
+                    self.pins[key] += 1
+                return entry
+            self.misses += 1
+
+        # loading happens unlocked so different samples can load in parallel
+        entry = load()
+
+        with self.lock:
+            existing = self.entries.get(key)
+            if existing is not None:
+                if self.free:
+                    self.free(entry.chunk)
+                entry = existing
+            else:
+                self.entries[key] = entry
+                self.size += entry.size
+            if pin:
+                self.pins[key] += 1
+            self.evict()
+            return entry
+
+    def evict(self):
+        with self.lock:
+            for key in list(self.entries)[:-1]:
+                if self.size <= self.budget:
+                    break
+                if self._held(key):
+                    continue
+                self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                if self._held(key):
+                    continue
+                self._drop(key)
+
+    def _held(self, key):
+        return key in self.pins or bool(self.in_use and self.in_use(self.entries[key].chunk))
+
+    def _drop(self, key):
+        entry = self.entries.pop(key)
+        self.size -= entry.size
+        logger.debug("evicting %s (%d bytes)", key, entry.size)
+        if self.free:
+            self.free(entry.chunk)
@@ -1,38 +1,121 @@
+import hashlib
+import heapq
 import json
 import logging
+import random
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import timedelta
+from itertools import count
+from threading import Condition
 from threading import Thread
 from typing import Dict
 
 import requests.exceptions
 
 from soundboard.config import state
+from soundboard.signals import api_created
+from soundboard.signals import api_updated
 from soundboard.types import api_state
+from . import session
+from .cache import ResponseCache
 
 logger = logging.getLogger("soundboard.api")
 instances: Dict[type, type] = {}
+response_cache = ResponseCache()
 
 
 class ApiManager(Thread):
-    def __init__(self, instances=instances):
+    """Refreshes cached clients when they are due.
+
+    Clients wait in a heap ordered by their next_update, the thread sleeps
+    until the first one is due and hands it to a worker pool, so a slow
+    endpoint only holds up one worker. A client is never fetched twice at
+    once; when its fetch ends it is put back with its new next_update.
+    """
+
+    def __init__(self, instances=instances, workers=4):
         super().__init__()
         self.daemon = True
         self.instances = instances
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="api")
+        self.condition = Condition()
+        self.heap = []
+        self.scheduled = {}
+        self.in_flight = set()
+        self.order = count()
+        self.running = False
+        api_created.connect(self.add)
+
+    def add(self, client, **kwargs):
+        if not client.cacheme:
+            return
+        with self.condition:
+            if client in self.in_flight:
+                return  # rescheduled when the fetch is done
+            due = client.next_update
+            if self.scheduled.get(client) == due:
+                return
+            self.scheduled[client] = due
+            heapq.heappush(self.heap, (due, next(self.order), client))
+            if self.heap[0][2] is client:
+                self.condition.notify()
 
     def run(self):
-        while True:
-            time.sleep(1)
-            self.update()
+        self.running = True
+        for client in list(self.instances.values()):
+            self.add(client)
+
+        with self.condition:
+            while self.running:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                due, _, client = self.heap[0]
+                delay = due - time.time()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                heapq.heappop(self.heap)
+                if self.scheduled.get(client) != due:
+                    continue  # superseded by a later add
+                self._submit(client)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.pool.shutdown(wait=False)
 
     def update(self):
-        for instance in self.instances.values():
-            if instance.stale and instance.cacheme:
-                try:
-                    instance.update()
-                except Exception as es:
-                    traceback.print_exc()
-                    logger.critical("api exception: %s", es)
+        """Fetches every stale client right away and waits for them."""
+        with self.condition:
+            futures = [
+                self._submit(client)
+                for client in list(self.instances.values())
+                if client.stale and client.cacheme and client not in self.in_flight
+            ]
+        for future in futures:
+            future.result()
+
+    def _submit(self, client):
+        self.scheduled.pop(client, None)
+        self.in_flight.add(client)
+        return self.pool.submit(self._fetch, client)
+
+    def _fetch(self, client):
+        try:
+            client.update()
+        except Exception as es:
+            traceback.print_exc()
+            logger.critical("api exception: %s", es)
+            client.backoff()
+        finally:
+            with self.condition:
+                self.in_flight.discard(client)
+            self.add(client)
 
 
 class ApiClient:
@@ -42,25 +125,41 @@ class ApiClient:
     UNAUTHORIZED = "UNAUTHORIZED"
     UNKNOWN = "MALFUNCTION"
     TIMEOUT = "timeout"
+    UNAVAILABLE = "UNAVAILABLE"
     cacheme = True
+    retry = 30
+    validators: Dict[str, str] = {}
 
-    def __new__(cls, url, _interval=2137, _cacheme=True, **arguments):
+    def __new__(cls, url, _interval=2137, _cacheme=True, _timeout=5, **arguments):
         attrs = cls, url, tuple(arguments.items())
         if attrs in instances:
             return instances[attrs]
         instance = super().__new__(cls)
         instance.cacheme = _cacheme
         instance.interval = _interval
+        instance.timeout = _timeout
+        key = [cls.__name__, url, sorted(arguments.items())]
+        # hashed, the arguments may hold api keys
+        instance.cache_key = hashlib.sha1(json.dumps(key, default=str).encode("utf-8")).hexdigest()
         instances[attrs] = instance
         return instance
 
     def __init__(self, url, **params):
+        if hasattr(self, "url"):
+            return  # shared instance, keep what was already fetched
         self.url = url
         self.params = params
 
         self.timestamp = 0
+        self.next_update = 0
+        self.expires = None
         self._status = self.UNKNOWN
         self._content = {}
+        self._last_good = None
+        self.failures = 0
+        if self.cacheme:
+            response_cache.restore(self)
+        api_created.send(self)
 
     def fetch_update(self):
         pass
@@ -68,15 +167,60 @@ class ApiClient:
     def update(self):
         self._content, self._status = self.fetch_update()
         self.timestamp = time.time()
+        if self._status == self.OK:
+            self.failures = 0
+            self.expires = self.expiry(self._content)
+            self.next_update = self.schedule(self._content)
+            if not self._last_good or self._last_good.data != self._content:
+                self._last_good = api_state(self._content, self._status)
+                api_updated.send(self)
+            if self.cacheme:
+                response_cache.store(self.cache_key, self._content, self.timestamp, self.validators)
+        else:
+            self.backoff()
+
+    def restore(self, content, timestamp, validators):
+        """Starts from a previous response, refreshing when it would have been due."""
+        self.timestamp = timestamp
+        self._content, self._status = content, self.OK
+        self._last_good = api_state(content, self.OK)
+        self.validators = validators
+        self.expires = self.expiry(content)
+        self.next_update = self.schedule(content)
+
+    def backoff(self):
+        """Schedules a retry after a failure, exponential with jitter up to interval."""
+        self.failures += 1
+        delay = min(self.interval, self.retry * 2 ** (self.failures - 1))
+        self.next_update = time.time() + random.uniform(delay / 2, delay)
+
+    def schedule(self, content):
+        """When to refresh after a successful update."""
+        return self.timestamp + self.interval
+
+    def expiry(self, content):
+        """When the fetched data stops being worth playing, None if never."""
+        return None
 
     def get(self):
         if self.stale or self._status != self.OK:
             self.update()
         return api_state(self._content, self._status)
 
+    def cached(self):
+        """Last good data without touching the network, even if a refresh is due.
+
+        UNAVAILABLE if there is no good data yet or it expired, the last
+        error is in status.
+        """
+        last_good = self._last_good
+        if last_good and (self.expires is None or time.time() < self.expires):
+            return last_good
+        return api_state(None, self.UNAVAILABLE)
+
     @property
     def stale(self):
-        return (time.time() - self.timestamp) > self.interval or not self.cacheme
+        return time.time() >= self.next_update or not self.cacheme
 
     @property
     def status(self):
@@ -85,13 +229,16 @@ class ApiClient:
 
 @state.clients.register
 class JSONApi(ApiClient):
+    """GETs json, revalidating with ETag / Last-Modified once it has data."""
+
     name = "json"
 
     def fetch_update(self):
-        http_to_status = {200: self.OK, 401: self.UNAUTHORIZED}
+        http_to_status = {200: self.OK, 304: self.OK, 401: self.UNAUTHORIZED}
         logging.info(f"requesting {self.url} ({self.params})")
+        headers = self.validators if self._last_good else {}
         try:
-            req = requests.get(self.url, params=self.params, timeout=5)
+            req = session.get(self.url, params=self.params, headers=headers, timeout=self.timeout)
         except requests.exceptions.ConnectionError:
             return None, self.DISCONNECTED
         except requests.exceptions.Timeout:
@@ -100,5 +247,45 @@ class JSONApi(ApiClient):
         status = http_to_status.get(req.status_code, self.UNKNOWN)
         if status != self.OK:
             return None, status
+        if req.status_code == 304:
+            return self._last_good.data, status
 
+        self.validators = {
+            header: req.headers[response_header]
+            for header, response_header in (("If-None-Match", "ETag"), ("If-Modified-Since", "Last-Modified"))
+            if response_header in req.headers
+        }
         return json.loads(req.text), status
+
+
+@state.clients.register
+class DepartureApi(JSONApi):
+    """Next departure from a stop, refreshed once the vehicle has left.
+
+    Expects ``hours`` and ``minutes`` (local time) in the response.
+    """
+
+    name = "departures"
+    min_interval = 30
+
+    @staticmethod
+    def departure(content, now=None):
+        now = now or datetime.now()
+        try:
+            departure = now.replace(
+                hour=int(content["hours"]), minute=int(content["minutes"]), second=0, microsecond=0,
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+        if departure < now - timedelta(hours=12):
+            departure += timedelta(days=1)  # past midnight
+        return departure.timestamp()
+
+    def expiry(self, content):
+        return self.departure(content)
+
+    def schedule(self, content):
+        departure = self.departure(content)
+        if departure is None:
+            return super().schedule(content)
+        return min(max(departure, self.timestamp + self.min_interval), self.timestamp + self.interval)
@@ -0,0 +1,66 @@
+import json
+import logging
+import os
+import time
+from threading import Lock
+
+logger = logging.getLogger("soundboard.api.cache")
+
+
+class ResponseCache:
+    """Last good api responses on disk, so clients have data right after a restart.
+
+    Entries are keyed by ApiClient.cache_key and hold the content, when it
+    was fetched and the revalidation headers. Entries older than max_age
+    seconds are neither restored nor kept.
+    """
+
+    version = 1
+
+    def __init__(self):
+        self.path = None
+        self.max_age = 0
+        self.entries = {}
+        self.lock = Lock()
+
+    def open(self, path, max_age):
+        self.path = path
+        self.max_age = max_age
+        self.entries = {}
+        if not path:
+            return
+        try:
+            with open(path, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.warning("ignoring broken api cache %s: %s", path, e)
+            return
+        if data.get("version") == self.version:
+            self.entries = data["entries"]
+
+    def fresh(self, entry):
+        return time.time() - entry["timestamp"] <= self.max_age
+
+    def restore(self, client):
+        entry = self.entries.get(client.cache_key)
+        if not entry or not self.fresh(entry):
+            return False
+        client.restore(entry["content"], entry["timestamp"], entry["validators"])
+        return True
+
+    def store(self, key, content, timestamp, validators):
+        if not self.path:
+            return
+        with self.lock:
+            self.entries[key] = {
+                "content": content,
+                "timestamp": timestamp,
+                "validators": validators,
+            }
+            self.entries = {key: e for key, e in self.entries.items() if self.fresh(e)}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as file:
+                json.dump({"version": self.version, "entries": self.entries}, file)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,53 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import sleep
+from typing import Dict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("soundboard.api.session")
+
+POOL_SIZE = 4
+TIMEOUT = 5
+
+_sessions: Dict[str, requests.Session] = {}
+_lock = Lock()
+_background = ThreadPoolExecutor(2, thread_name_prefix="http")
+
+
+def session(url):
+    """Keep-alive session shared by everything talking to the url's host."""
+    parts = urlsplit(url)
+    key = parts.scheme, parts.netloc
+    with _lock:
+        if key not in _sessions:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            http = requests.Session()
+            http.mount("%s://%s" % key, adapter)
+            _sessions[key] = http
+        return _sessions[key]
+
+
+def get(url, **kwargs):
+    kwargs.setdefault("timeout", TIMEOUT)
+    return session(url).get(url, **kwargs)
+
+
+def fire(url, delay=0):
+    """GETs url on a small background pool, errors are only logged.
+
+    :rtype: concurrent.futures.Future
+    """
+
+    def request():
+        if delay:
+            sleep(delay)
+        try:
+            get(url).close()
+        except requests.exceptions.RequestException as e:
+            logger.warning("request to %s failed: %s", url, e)
+
+    return _background.submit(request)
@@ -17,15 +17,28 @@ class Settings(Argumentize):
     wav_directory = OptionStr(required=True, fmt=os.path.expanduser)
     yaml_directory = OptionStr(required=True, fmt=os.path.expanduser)
     debug = OptionBool(False)
-    input_type = OptionStr("evdev", help="sdl, evdev")
-    device_path = OptionStr()
+    input_type = OptionStr("evdev", help="sdl, evdev, replay")
+    device_path = OptionStr(help="input device, or the recording to replay")
+    record_input = OptionStr(help="file the device's raw events are recorded to")
+    replay_speed = OptionInt(1, help="replay pace multiplier, 0 replays as fast as possible")
     button_poll_buffer = OptionInt(35)
     button_poll_active_buffer = OptionInt(15)
     scancode_offset = OptionInt(304)
+    chord_mode = OptionStr("window", help="window: buttons pushed together, sequence: clicked one after another")
+    chord_debounce = OptionInt(0, help="msec in which a button released and pushed again is bouncing")
+    chord_early_fire = OptionBool(True, help="resolve a chord as soon as it can only mean one sound")
     weather_url = OptionStr("http://127.0.0.1:7654")
     openweather_api_key = OptionStr()
     weather_interval = OptionInt(15 * 60)
     jakdojade_url = OptionStr("http://localhost:5000/schedule/next")
+    ztm_interval = OptionInt(5 * 60, help="longest time between departure refreshes")
+    api_unavailable_sentence = OptionStr("data unavailable", help="vox said when an api has no data yet")
+    api_workers = OptionInt(4, help="api clients refreshed at once")
+    api_cache_path = OptionStr(help="file keeping api responses across restarts")
+    api_cache_max_age = OptionInt(6 * 60 * 60, help="oldest api response restored, in seconds")
+    play_queue_size = OptionInt(16, help="remote play requests waiting at most, more are refused")
+    play_coalesce = OptionInt(250, help="msec in which remote plays of the same sound are merged")
+    runtime = OptionStr("threads", help="threads, asyncio: one event loop for input and servers (needs aiohttp)")
     http = OptionBool(True)
     http_ip = OptionStr("0.0.0.0")
     http_port = OptionInt(8080)
@@ -35,6 +48,32 @@ class Settings(Argumentize):
     mqtt_path = OptionStr("server path")
     mqtt_login = OptionStr("public")
     mqtt_password = OptionStr("public")
+    mixer = OptionStr("sdl", help="sdl, software (needs numpy, no audio device)")
+    software_output = OptionStr(help="wav file the software mixer writes to, empty discards")
+    software_realtime = OptionBool(True, help="software mixer runs at playback speed")
+    software_block_size = OptionInt(1024, help="frames mixed at once by the software mixer")
+    audio_frequency = OptionInt(44100, help="output sample rate")
+    audio_format = OptionStr("s16", help="output sample format: u8, s16, s32, f32")
+    audio_channels = OptionInt(2)
+    audio_buffer = OptionInt(1024, help="output buffer in frames, smaller lowers latency")
+    resample = OptionBool(False, help="convert WAV samples to the output format once, kept on disk (needs numpy)")
+    mixer_channels = OptionInt(16, help="sounds playing at once")
+    steal_policy = OptionStr("oldest", help="channel taken when all are busy: oldest, quietest, same_sound")
+    sample_cache_size = OptionInt(64, help="sample cache budget in MiB")
+    stream_threshold = OptionInt(0, help="samples decoding to more MiB are streamed from disk, 0 never streams")
+    load_workers = OptionInt(4, help="threads loading sound sets, 0 loads them in order")
+    lazy_load = OptionBool(False, help="decode samples when their sound set is activated")
+    manifest_path = OptionStr(help="sample manifest, defaults to <wav_directory>.manifest.json")
+    sample_bank = OptionStr(help="packed sample bank, built with python -m soundboard.bank")
+    trim_silence = OptionInt(0, help="trim leading/trailing silence below this dBFS, 0 disables (needs numpy)")
+    normalize = OptionStr("", help="'', peak or rms loudness normalization (needs numpy)")
+    normalize_level = OptionInt(-3, help="normalization target in dBFS")
+    processed_directory = OptionStr(help="processed samples, defaults to <wav_directory>.processed")
+    vox_cache_size = OptionInt(8, help="rendered vox phrase cache budget in MiB")
+    vox_gap = OptionInt(0, help="silence between vox words in msec")
+    vox_trim_threshold = OptionInt(
+        128, help="trailing vox word samples below this peak are trimmed, 0 disables",
+    )
 
     delay_constant = 0
     delay_multiplier = 0
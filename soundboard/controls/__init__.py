@@ -1 +1,2 @@
 from .controls import *  # noqa F401
+from . import replay  # noqa F401 registers the replay backend
@@ -0,0 +1,122 @@
+"""Chord detection, deciding which raw events make up one press.
+
+A detector collects the events of a chord from its first event on and
+keeps a deadline, derived from event timestamps only, after which the
+chord is resolved. With a ``complete`` callback it fires early, as soon as
+the buttons clicked can only mean one combination.
+"""
+import logging
+
+from soundboard.enums import EventTypes
+
+logger = logging.getLogger("soundboard.controls.chords")
+
+
+class BaseChordDetector:
+    def __init__(self, debounce=0, complete=None):
+        """
+        :param debounce: seconds in which a button released and pushed again is bouncing
+        :param complete: complete(clicks, held) -> bool, True if no longer combination starts with clicks
+        """
+        self.debounce = debounce
+        self.complete = complete
+        self.last_release = {}
+        self.bouncing = set()
+        self.pushed = 0
+        self.released = 0
+        self.started = 0
+        self.window = 0
+        self.deadline = 0
+
+    def start(self, timestamp, window):
+        self.pushed = 0
+        self.released = 0
+        self.started = timestamp
+        self.window = window
+        self.deadline = timestamp + window
+
+    def add(self, events):
+        for event in sorted(events, key=lambda e: e.timestamp):
+            if event.button < 0:
+                logger.debug("ignoring button %d below scancode offset", event.button)
+                continue
+            if self.bounced(event):
+                continue
+            mask = 1 << event.button
+            if event.type == EventTypes.push:
+                self.pushed |= mask
+            elif event.type == EventTypes.release:
+                self.released |= mask
+                self.last_release[event.button] = event.timestamp
+            self.extend(event)
+
+    def bounced(self, event):
+        button, type, timestamp = event
+        if type == EventTypes.release and button in self.bouncing:
+            self.bouncing.discard(button)
+            return True
+        if type != EventTypes.push or not self.debounce:
+            return False
+        released_at = self.last_release.get(button)
+        if released_at is None or timestamp - released_at >= self.debounce:
+            return False
+        logger.debug("button %d bounced", button)
+        if released_at >= self.started:
+            # the release was contact chatter, the button is still down
+            self.released &= ~(1 << button)
+        else:
+            # the release was resolved already, drop this press whole
+            self.bouncing.add(button)
+        return True
+
+    def extend(self, event):
+        """Moves the deadline for a new event."""
+
+    def ready(self, held):
+        """True if the chord can be resolved before its deadline."""
+        clicks = self.pushed & self.released
+        if not self.complete or not clicks or self.pushed & ~self.released:
+            return False
+        return self.complete(clicks, held)
+
+
+class WindowDetector(BaseChordDetector):
+    """Chords are buttons pushed within window of the first one.
+
+    A release means the chord is over, the rest of it only has
+    release_window to follow.
+    """
+
+    release_window = 0.04
+
+    def extend(self, event):
+        if event.type == EventTypes.release:
+            self.deadline = min(self.deadline, event.timestamp + self.release_window)
+
+
+class SequenceDetector(BaseChordDetector):
+    """Buttons clicked one after another form a combination.
+
+    The chord goes on while each event follows the previous one within
+    window.
+    """
+
+    def extend(self, event):
+        self.deadline = max(self.deadline, event.timestamp + self.window)
+
+
+DETECTORS = {
+    "window": WindowDetector,
+    "sequence": SequenceDetector,
+}
+
+
+def from_settings(settings, complete=None):
+    """:type settings: soundboard.config.settings"""
+    detector = DETECTORS.get(settings.chord_mode)
+    if not detector:
+        raise ValueError("unknown chord mode %s" % settings.chord_mode)
+    return detector(
+        debounce=settings.chord_debounce / 1000,
+        complete=complete if settings.chord_early_fire else None,
+    )
@@ -1,13 +1,17 @@
 import logging
+import selectors
 import time
 from itertools import chain
 
+from .chords import BaseChordDetector
+from .chords import WindowDetector
 from .raw_controls import HANDLERS
 from .raw_controls import BaseRawJoystick
 from soundboard.enums import EventTypes
 from soundboard.exceptions import ControllerException
+from soundboard.types import event_tuple
 from soundboard.types import states_tuple
-from typing import Any, List, Set
+from typing import Any, Dict, Generator, List, Optional, Set, Tuple
 from ..defines import DEFAULT_HANDLER
 
 
@@ -32,6 +36,8 @@ class Joystick:
 
     @staticmethod
     def open_joystick(joystick_source, backend, offset):
+        if isinstance(joystick_source, BaseRawJoystick):
+            return joystick_source
         backend_handler = HANDLERS.get(backend)
         if not backend_handler:
             raise ControllerException("unknown type %s" % backend)
@@ -41,16 +47,30 @@ class Joystick:
         self.raw_joystick.update()
         return self.raw_joystick.pop_events()
 
+    def fileno(self):
+        return self.raw_joystick.fileno()
+
+    @property
+    def generation(self):
+        return self.raw_joystick.generation
+
     @property
     def pending(self):
         return not self.raw_joystick.isempty
 
 
 class ControlHandler:
-    def __init__(self):
+    # backends without a file descriptor (SDL) are polled this often
+    poll_interval = 0.01
+
+    def __init__(self, detector: Optional[BaseChordDetector] = None):
         self.controllers: List[BaseRawJoystick] = []
-        self.held = set()
-        self.released = set()
+        self.detector = detector or WindowDetector()
+        self.held = 0
+        self.released = 0
+        self.first_event: Optional[float] = None
+        self.selector = selectors.DefaultSelector()
+        self.registered: Dict[Any, Tuple[int, int]] = {}
 
     def register_controler(self, controller):
         self.controllers.append(controller)
@@ -62,42 +82,104 @@ class ControlHandler:
     def poll_raw(self):
         return list(chain.from_iterable(c.poll_raw() for c in self.controllers))
 
-    def poll_buffered(self, buffer_time: float) -> states_tuple:
-        pushed: Set[int] = set()
-        released: Set[int] = set()
-        break_on = 0
-
-        rounds = max(int(buffer_time / 0.01), 1)
-
-        for i in range(rounds):
-            time.sleep(0.01)
+    def _sync_selector(self):
+        for controller in self.controllers:
+            fd = controller.fileno()
+            current = (fd, controller.generation)
+            previous = self.registered.get(controller)
+            if previous == current:
+                continue
+            if previous and previous[0] is not None:
+                self.selector.unregister(previous[0])
+            if fd is not None:
+                self.selector.register(fd, selectors.EVENT_READ, controller)
+            self.registered[controller] = current
+
+        return any(fd is None for fd, _ in self.registered.values())
+
+    def wait_raw(self, timeout: Optional[float] = None) -> List[event_tuple]:
+        """Blocks until any controller has events or timeout (in seconds) passes."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        events = self.poll_raw()
+        while not events:
+            polled = self._sync_selector()
+            wait = None if deadline is None else deadline - time.monotonic()
+            if wait is not None and wait <= 0:
+                break
+            if polled:
+                wait = self.poll_interval if wait is None else min(wait, self.poll_interval)
+            self.selector.select(wait)
             events = self.poll_raw()
-            if not any([events, pushed, released]):
+        return events
+
+    def collect(
+        self, buffer_time: float, timeout: Optional[float] = 0
+    ) -> Generator[Optional[float], List[event_tuple], states_tuple]:
+        """Resolves one chord, waiting is left to the caller.
+
+        Yields how long to wait for events and expects them sent back,
+        returns the state. poll_buffered drives it with wait_raw. first_event
+        is the timestamp the state was read at, None if it had no events.
+
+        :param buffer_time: chord window of the detector
+        :param timeout: how long to wait for the first event, None blocks
+        """
+        # set again only if this chord has events, a deferred release has no input
+        self.first_event = None
+        if self.released:
+            # the release of the last click is reported now, not after timeout
+            timeout = 0
+        events = yield timeout
+        if not events:
+            return self.resolve(0, 0)
+
+        detector = self.detector
+        self.first_event = min(e.timestamp for e in events)
+        detector.start(self.first_event, buffer_time)
+        while events:
+            detector.add(events)
+            if detector.ready(self.held):
                 break
-            state = self.to_state(events)
-            released |= state.released
-            pushed |= state.pushed
-            if state.released:
-                if not break_on:
-                    break_on = i + 4
-            if break_on and break_on == i:
+            remaining = detector.deadline - time.monotonic()
+            if remaining <= 0:
                 break
-
+            events = yield remaining
+
+        return self.resolve(detector.pushed, detector.released)
+
+    def poll_buffered(self, buffer_time: float, timeout: Optional[float] = 0) -> states_tuple:
+        """
+        :param buffer_time: chord window of the detector
+        :param timeout: how long to wait for the first event, None blocks
+        """
+        chord = self.collect(buffer_time, timeout)
+        try:
+            wait = next(chord)
+            while True:
+                wait = chord.send(self.wait_raw(wait))
+        except StopIteration as done:
+            return done.value
+
+    def resolve(self, pushed: int, released: int) -> states_tuple:
+        """Folds the buttons pushed and released during one buffer into the held state."""
         clicks = pushed & released
-        self.held |= pushed - released
-        self.held -= released
+        self.held |= pushed & ~released
+        self.held &= ~released
 
         self.released |= released
-        released_now = self.released - pushed
-        self.released -= released_now
+        released_now = self.released & ~pushed
+        self.released &= ~released_now
 
-        return states_tuple(*[frozenset(f) for f in [clicks, released_now, self.held]])
+        return states_tuple(clicks, released_now, self.held)
 
     @staticmethod
-    def to_states_sets(events):
-        containers = {event_type: set() for event_type in EventTypes}
-        for (button, state) in events:
-            containers[state].add(button)
+    def to_states_masks(events):
+        containers = {event_type: 0 for event_type in EventTypes}
+        for (button, state, _) in events:
+            if button < 0:
+                logger.debug("ignoring button %d below scancode offset", button)
+                continue
+            containers[state] |= 1 << button
 
         pushed = containers[EventTypes.push]
         released = containers[EventTypes.release]
@@ -106,5 +188,5 @@ class ControlHandler:
 
     @classmethod
     def to_state(cls, events):
-        pushed, released, held = cls.to_states_sets(events)
-        return states_tuple(*map(frozenset, [pushed, released, held]))
+        pushed, released, held = cls.to_states_masks(events)
+        return states_tuple(pushed, released, held)
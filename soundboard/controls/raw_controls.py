@@ -1,4 +1,5 @@
 import logging
+import os
 import time
 
 import evdev.ecodes
@@ -15,11 +16,45 @@ from queue import Queue
 logger = logging.getLogger("soundboard.controls.raw")
 
 
+class EventQueue(Queue):
+    """Queue with a wakeup pipe, so consumers can wait on it with select."""
+
+    def __init__(self, maxsize=0):
+        super().__init__(maxsize)
+        self._reader, self._writer = os.pipe()
+        os.set_blocking(self._reader, False)
+        os.set_blocking(self._writer, False)
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        try:
+            os.write(self._writer, b"\0")
+        except BlockingIOError:
+            pass  # pipe is full, the consumer is going to wake up anyway
+
+    def fileno(self):
+        return self._reader
+
+    def drain(self):
+        try:
+            while os.read(self._reader, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
 class BaseRawJoystick:
+    # bumped whenever the underlying file descriptor is reopened
+    generation = 0
+
     def __init__(self, offset=0):
         self.scancode_offset = offset
         self.events = list()
 
+    def fileno(self):
+        """Descriptor to wait on, None if the backend has to be polled."""
+        return None
+
     @property
     def isempty(self):
         return len(self.events) == 0
@@ -47,9 +82,9 @@ class BaseRawJoystick:
             logger.debug("shift %d -> %d", button, new_button)
             return new_button
 
-        button, type = event
+        button, type, timestamp = event
         new_button = shift(button)
-        return event_tuple(new_button, type)
+        return event_tuple(new_button, type, timestamp or time.monotonic())
 
 
 class RawQueueJoystick(BaseRawJoystick):
@@ -60,12 +95,19 @@ class RawQueueJoystick(BaseRawJoystick):
         self.keys_held = dict()
         self.last_key_at = 0
 
+    def fileno(self):
+        fileno = getattr(self.queue, "fileno", None)
+        return fileno() if fileno else None
+
     def update(self):
+        if hasattr(self.queue, "drain"):
+            self.queue.drain()
         while not self.queue.empty():
-            button_id, event_id = self.queue.get_nowait()
+            # producers may pass the monotonic time the event happened at
+            button_id, event_id, *stamp = self.queue.get_nowait()
             event = EventTypes(event_id)
             logging.info("%s %s", button_id, event)
-            self.events.append(event_tuple(button_id, event))
+            self.events.append(event_tuple(button_id, event, (stamp and stamp[0]) or time.monotonic()))
             if event == EventTypes.push:
                 timestamp = time.time()
                 self.keys_held[button_id] = timestamp
@@ -82,7 +124,7 @@ class RawQueueJoystick(BaseRawJoystick):
         for btn_id, timestamp in self.keys_held.items():
             if not timestamp:
                 continue
-            event = event_tuple(btn_id, EventTypes.release)
+            event = event_tuple(btn_id, EventTypes.release, time.monotonic())
             self.events.append(event)
             self.keys_held[btn_id] = False
 
@@ -125,13 +167,18 @@ class RawEVDEVJoystick(BaseRawJoystick):
     def __init__(self, device_path, offset=0):
         super().__init__(offset)
         self.device_path = device_path
+        self.joystick = None
         self.setup_device(self.device_path)
 
+    def fileno(self):
+        return self.joystick.fd if self.joystick else None
+
     def setup_device(self, device_path):
         is_name = "input/event" not in device_path
         func = self.device_from_name if is_name else evdev.InputDevice
         try:
             self.joystick = func(device_path)
+            self.generation += 1
             if EVDEV_GRAB:
                 self.joystick.grab()
         except Exception as e:
@@ -157,12 +204,14 @@ class RawEVDEVJoystick(BaseRawJoystick):
             return []
 
     def update(self):
+        events = [e for e in self._read() if e.type in self.JOYSTICK_EVENTS]
+        timestamp = time.monotonic()
+
         def to_tuple(event):
             type = EventTypes(event.value)
             button = event.code
-            return event_tuple(button, type)
+            return event_tuple(button, type, timestamp)
 
-        events = [e for e in self._read() if e.type in self.JOYSTICK_EVENTS]
         self.process(events, to_tuple)
 
 
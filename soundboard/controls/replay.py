@@ -0,0 +1,257 @@
+"""Recording and replaying raw button events, for load and soak tests.
+
+Recordings are a short header followed by fixed size records: seconds
+since the first event, button (already shifted by the scancode offset)
+and event type. Replaying one feeds the events back through a queue
+joystick at the recorded pace, sped up, or as fast as possible.
+"""
+import logging
+import struct
+import sys
+from difflib import SequenceMatcher
+from functools import partial
+from threading import Event
+from threading import Lock
+from threading import Thread
+from time import monotonic
+from time import sleep
+from typing import List
+from typing import NamedTuple
+
+from . import chords
+from .chords import WindowDetector
+from .controls import ControlHandler
+from .controls import Joystick
+from .raw_controls import HANDLERS
+from .raw_controls import EventQueue
+from .raw_controls import RawQueueJoystick
+from soundboard.config import settings
+from soundboard.enums import EventTypes
+from soundboard.types import event_tuple
+from soundboard.types import states_tuple
+
+logger = logging.getLogger("soundboard.controls.replay")
+
+MAGIC = b"SBREC\0"
+VERSION = 1
+header = struct.Struct("<6sH")
+# seconds since the first event, button, event type
+record = struct.Struct("<dhH")
+
+
+class Recorder:
+    """Appends the events joysticks read to a recording."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(header.pack(MAGIC, VERSION))
+        self.start = None
+        self.count = 0
+        self.lock = Lock()
+
+    def write(self, events):
+        with self.lock:
+            for button, type, timestamp in events:
+                if self.start is None:
+                    self.start = timestamp
+                self.file.write(record.pack(timestamp - self.start, button, type.value))
+            self.count += len(events)
+            self.file.flush()
+
+    def attach(self, joystick):
+        """Records everything joystick reads from now on.
+
+        :type joystick: Joystick
+        """
+        poll_raw = joystick.poll_raw
+
+        def recording_poll_raw():
+            events = poll_raw()
+            if events:
+                self.write(events)
+            return events
+
+        joystick.poll_raw = recording_poll_raw
+        return joystick
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+        logger.info("recorded %d events to %s", self.count, self.path)
+
+
+def read_recording(path) -> List[event_tuple]:
+    """Recorded events, timestamps are seconds since the first one."""
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < header.size or header.unpack_from(data) != (MAGIC, VERSION):
+        raise ValueError("%s is not an input recording" % path)
+    return [
+        event_tuple(button, EventTypes(type), timestamp)
+        for timestamp, button, type in record.iter_unpack(data[header.size:])
+    ]
+
+
+class RawReplayJoystick(RawQueueJoystick):
+    """Plays a recording back from a thread, like a device would send it.
+
+    Events carry the time they were sent at, so chords are resolved the
+    same way as live ones.
+    """
+
+    def __init__(self, path, offset=0, speed=None):
+        """
+        :param offset: ignored, recorded buttons are already shifted
+        :param speed: multiplier of the recorded pace, 0 sends everything at once
+        """
+        super().__init__(EventQueue())
+        self.recording = read_recording(path)
+        self.speed = settings.replay_speed if speed is None else speed
+        self.done = Event()
+        self.started = None
+        self.thread = Thread(target=self.feed, daemon=True)
+        self.thread.start()
+
+    def feed(self):
+        self.started = monotonic()
+        for button, type, timestamp in self.recording:
+            if self.speed:
+                send_at = self.started + timestamp / self.speed
+                sleep(max(send_at - monotonic(), 0))
+            else:
+                send_at = monotonic()
+            self.queue.put((button, type.value, send_at))
+        self.done.set()
+        logger.info("replayed %d events", len(self.recording))
+
+    @property
+    def finished(self):
+        return self.done.is_set() and self.queue.empty() and self.isempty
+
+
+HANDLERS["replay"] = RawReplayJoystick
+
+
+def resolve(events, buffers, timeout=1, detector=None):
+    """Chords the board would have seen at the recorded pace.
+
+    Follows Board.run and ControlHandler.poll_buffered on recorded
+    timestamps, without waiting for anything.
+
+    :param buffers: (idle, active) buffer time in seconds
+    :param timeout: pause after which the board falls back to the idle buffer
+    :type detector: soundboard.controls.chords.BaseChordDetector
+    :rtype: list of non-empty states_tuple
+    """
+    handler = ControlHandler(detector)
+    detector = handler.detector
+    states = []
+    active = False
+    last_end = None
+    i = 0
+    while i < len(events):
+        first = events[i].timestamp
+        if last_end is not None and first - last_end >= timeout:
+            active = False
+        detector.start(first, buffers[active])
+        # fired early the chord ends with its last event, otherwise at the deadline
+        while i < len(events) and events[i].timestamp < detector.deadline:
+            detector.add(events[i:i + 1])
+            i += 1
+            if detector.ready(handler.held):
+                last_end = events[i - 1].timestamp
+                break
+        else:
+            last_end = detector.deadline
+        state = handler.resolve(detector.pushed, detector.released)
+        active = any(state)
+        if active:
+            states.append(state)
+        if handler.released and (i == len(events) or events[i].timestamp > last_end):
+            # the next poll reports the release of the clicks on its own
+            states.append(handler.resolve(0, 0))
+    return states
+
+
+class replay_report(NamedTuple):
+    events: int
+    seconds: float
+    expected: int
+    resolved: int
+    dropped: int
+    misresolved: int
+    latencies: List[float]
+
+    @property
+    def throughput(self):
+        return self.events / self.seconds if self.seconds else 0
+
+    def latency(self, quantile):
+        if not self.latencies:
+            return 0
+        ordered = sorted(self.latencies)
+        return ordered[min(int(quantile * len(ordered)), len(ordered) - 1)]
+
+    def __str__(self):
+        return (
+            f"{self.events} events in {self.seconds:.2f}s ({self.throughput:.0f}/s)\n"
+            f"chords: {self.expected} expected, {self.resolved} resolved, "
+            f"{self.dropped} dropped, {self.misresolved} mis-resolved\n"
+            f"dispatch latency: p50 {self.latency(0.5) * 1000:.1f} ms, "
+            f"p99 {self.latency(0.99) * 1000:.1f} ms, max {max(self.latencies, default=0) * 1000:.1f} ms"
+        )
+
+
+def replay(path, speed=None, buffers=None, timeout=1, detector=WindowDetector) -> replay_report:
+    """Resolves a recording like Board.run does and compares the chords to the recorded pace.
+
+    Dispatch latency is the time from a chord's first event being sent to it
+    being resolved, so it includes the chord buffer.
+
+    :param buffers: (idle, active) buffer time in seconds, defaults to the board's
+    :param detector: makes the chord detectors, one for the replay and one for the recorded pace
+    """
+    if buffers is None:
+        buffers = settings.button_poll_buffer / 100, settings.button_poll_active_buffer / 100
+    raw = RawReplayJoystick(path, speed=speed)
+    handler = ControlHandler(detector())
+    handler.register_controler(Joystick(raw))
+
+    resolved: List[states_tuple] = []
+    latencies = []
+    active = False
+    while not raw.finished or handler.released:
+        state = handler.poll_buffered(buffers[active], timeout=0 if raw.done.is_set() else timeout)
+        active = any(state)
+        if active:
+            if handler.first_event is not None:
+                latencies.append(monotonic() - handler.first_event)
+            resolved.append(state)
+    seconds = monotonic() - raw.started
+
+    expected = resolve(raw.recording, buffers, timeout, detector())
+    matcher = SequenceMatcher(None, expected, resolved, autojunk=False)
+    matched = sum(block.size for block in matcher.get_matching_blocks())
+    return replay_report(
+        events=len(raw.recording),
+        seconds=seconds,
+        expected=len(expected),
+        resolved=len(resolved),
+        dropped=len(expected) - matched,
+        misresolved=len(resolved) - matched,
+        latencies=latencies,
+    )
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    settings.from_files(cfg="yaml", verbose=True)
+    settings.from_args(sys.argv[1:])
+    if not settings.device_path:
+        sys.exit("--device_path has to point at a recording")
+    print(replay(settings.device_path, detector=partial(chords.from_settings, settings)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import logging
+from concurrent.futures import Future
+from contextvars import copy_context
+from functools import partial
+from heapq import heappop
+from heapq import heappush
+from itertools import count
+from threading import Condition
+from threading import Thread
+from time import monotonic
+
+from .enums import Priority
+from .exceptions import PlaybackBusy
+from .signals import sound_stopped
+
+logger = logging.getLogger("soundboard.dispatcher")
+
+
+class Dispatcher(Thread):
+    """Runs every play and stop on one thread, in priority order.
+
+    Local input is never refused. At most max_pending remote requests are
+    queued or playing, a request that returns a playback future holds its
+    slot until that resolves or its sound is stopped; PlaybackBusy is raised
+    when all are taken. A
+    remote request for a sound already requested in the last coalesce
+    seconds gets the earlier request's future instead of playing it again.
+    """
+
+    def __init__(self, max_pending=16, coalesce=0.25):
+        super().__init__()
+        self.daemon = True
+        self.max_pending = max_pending
+        self.coalesce = coalesce
+        self.queue = []
+        self.pending = 0
+        self.recent = {}
+        # playback futures holding a remote slot, by the sound they play
+        self.held = {}
+        self.counter = count()
+        self.condition = Condition()
+        self.running = True
+        sound_stopped.connect(self._stopped)
+
+    def submit(self, func, priority=Priority.local, sound=None):
+        """Calls func on the dispatcher thread.
+
+        :param sound: stopping it releases the remote slot of func's playback future
+        :rtype: concurrent.futures.Future resolved with func's result
+        """
+        future = Future()
+        with self.condition:
+            if priority is not Priority.local:
+                if self.pending >= self.max_pending:
+                    raise PlaybackBusy(self.pending)
+                self.pending += 1
+            # runs in the caller's context, which carries the latency trace
+            func = partial(copy_context().run, func)
+            heappush(self.queue, (priority.value, next(self.counter), func, future, sound))
+            if not self.is_alive():
+                self.start()
+            self.condition.notify()
+        return future
+
+    def play(self, sound, priority=Priority.remote):
+        """Queues an async play of sound.
+
+        :rtype: concurrent.futures.Future resolved with the playback future once started
+        """
+        with self.condition:
+            now = monotonic()
+            last = self.recent.get(sound)
+            if last and now - last[0] < self.coalesce:
+                return last[1]
+            future = self.submit(lambda: sound.play(is_async=True), priority, sound)
+            self.recent[sound] = now, future
+        return future
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.queue:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                priority, _, func, future, sound = heappop(self.queue)
+            remote = priority != Priority.local.value
+
+            if not future.set_running_or_notify_cancel():
+                if remote:
+                    self._release()
+                continue
+            try:
+                result = func()
+            except Exception as e:
+                logger.exception("dispatching %s failed", func)
+                future.set_exception(e)
+                result = None
+            else:
+                future.set_result(result)
+            if not remote:
+                continue
+            if isinstance(result, Future):
+                with self.condition:
+                    self.held[result] = sound
+                result.add_done_callback(self._release)
+            else:
+                self._release()
+
+    def _release(self, playback=None):
+        with self.condition:
+            if playback is not None:
+                if playback not in self.held:
+                    return  # released when its sound stopped
+                del self.held[playback]
+            self.pending -= 1
+
+    def _stopped(self, sound):
+        with self.condition:
+            for playback in [p for p, s in self.held.items() if s is sound]:
+                del self.held[playback]
+                self.pending -= 1
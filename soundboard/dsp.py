@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import os
+import tempfile
+import wave
+
+import numpy as np
+from sdl2.audio import SDL_AUDIO_BITSIZE
+from sdl2.audio import SDL_AUDIO_ISBIGENDIAN
+from sdl2.audio import SDL_AUDIO_ISFLOAT
+from sdl2.audio import SDL_AUDIO_ISSIGNED
+
+logger = logging.getLogger("soundboard.dsp")
+
+NORMALIZERS = ("", "peak", "rms")
+WAVE_TYPES = {1: "u1", 2: "<i2", 4: "<i4"}
+
+
+def sample_dtype(fmt):
+    kind = "f" if SDL_AUDIO_ISFLOAT(fmt) else "i" if SDL_AUDIO_ISSIGNED(fmt) else "u"
+    order = ">" if SDL_AUDIO_ISBIGENDIAN(fmt) else "<"
+    return np.dtype(f"{order}{kind}{SDL_AUDIO_BITSIZE(fmt) // 8}")
+
+
+def to_float(samples):
+    """Scales integer samples to float32 in [-1, 1)."""
+    if samples.dtype.kind == "f":
+        return samples.astype(np.float32)
+    scale = float(1 << (samples.dtype.itemsize * 8 - 1))
+    offset = scale if samples.dtype.kind == "u" else 0
+    return ((samples.astype(np.float32) - offset) / scale).astype(np.float32)
+
+
+def from_float(samples, dtype):
+    if dtype.kind == "f":
+        return np.clip(samples, -1, 1).astype(dtype)
+    scale = float(1 << (dtype.itemsize * 8 - 1))
+    offset = scale if dtype.kind == "u" else 0
+    info = np.iinfo(dtype)
+    scaled = np.round(samples * scale + offset)
+    return np.clip(scaled, info.min, info.max).astype(dtype)
+
+
+def read_wav(path):
+    """Decodes a PCM WAV file to float32 frames, returns (samples, rate)."""
+    with wave.open(path) as wave_file:
+        width = wave_file.getsampwidth()
+        channels = wave_file.getnchannels()
+        rate = wave_file.getframerate()
+        frames = wave_file.readframes(wave_file.getnframes())
+
+    if width == 3:
+        raw = np.frombuffer(frames, np.uint8).reshape(-1, 3).astype(np.int32)
+        packed = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = ((packed ^ 0x800000) - 0x800000).astype(np.float32) / (1 << 23)
+    elif width in WAVE_TYPES:
+        samples = to_float(np.frombuffer(frames, WAVE_TYPES[width]))
+    else:
+        raise ValueError("unsupported sample width %d in %s" % (width, path))
+    return samples.reshape(-1, channels), rate
+
+
+def remix(samples, channels):
+    """Downmixes to mono or spreads mono to channels, other layouts are averaged."""
+    if samples.shape[1] == channels:
+        return samples
+    mono = samples.mean(axis=1, keepdims=True)
+    return np.repeat(mono, channels, axis=1)
+
+
+def resample(samples, rate, target):
+    """Band-limited resampling through the FFT of the whole sample.
+
+    Zero padding keeps the end of the sample from wrapping into its start.
+    """
+    if rate == target or not len(samples):
+        return samples
+    padding = rate // 10
+    padded = np.concatenate([samples, np.zeros((padding, samples.shape[1]), samples.dtype)])
+    length = int(round(len(padded) * target / rate))
+    spectrum = np.fft.rfft(padded, axis=0)
+    bins = length // 2 + 1
+    if bins < len(spectrum):
+        spectrum = spectrum[:bins]
+    resampled = np.fft.irfft(spectrum, n=length, axis=0) * (length / len(padded))
+    return resampled[:int(round(len(samples) * target / rate))].astype(np.float32)
+
+
+def db_to_gain(db):
+    return 10 ** (db / 20)
+
+
+def audible_range(samples, threshold):
+    """First and last + 1 frame louder than threshold (linear)."""
+    loud = np.flatnonzero(np.abs(samples).max(axis=1) > threshold)
+    if not len(loud):
+        return 0, len(samples)
+    return loud[0], loud[-1] + 1
+
+
+def normalize(samples, mode, level):
+    """Applies peak or rms gain so the sample reaches level (dBFS)."""
+    if mode == "peak":
+        current = np.abs(samples).max(initial=0)
+    elif mode == "rms":
+        current = np.sqrt(np.mean(np.square(samples, dtype=np.float64))) if samples.size else 0
+    else:
+        return samples
+    if not current:
+        return samples
+    return samples * np.float32(db_to_gain(level) / current)
+
+
+class SampleProcessor:
+    """Trims silence and normalizes loudness of decoded samples.
+
+    Results are kept in directory as raw PCM named after the source hash,
+    the output format and the processing parameters.
+    """
+
+    def __init__(self, directory=None, trim=0, normalize="", level=-3, resample=False):
+        """
+        :param trim: silence threshold in dBFS, 0 disables trimming
+        :param normalize: one of NORMALIZERS
+        :param level: normalization target in dBFS
+        :param resample: convert WAV sources here instead of taking the mixer's conversion
+        """
+        if normalize not in NORMALIZERS:
+            raise ValueError("unknown normalization %s" % normalize)
+        self.directory = directory
+        self.trim = trim
+        self.normalize = normalize
+        self.level = level
+        self.resample = resample
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def process(self, pcm, spec):
+        dtype = sample_dtype(spec.format)
+        samples = to_float(np.frombuffer(pcm, dtype).reshape(-1, spec.channels))
+        if self.trim:
+            start, end = audible_range(samples, db_to_gain(self.trim))
+            samples = samples[start:end]
+        samples = normalize(samples, self.normalize, self.level)
+        return from_float(samples, dtype).tobytes()
+
+    def _path(self, source_hash, spec):
+        params = f"{source_hash}:{tuple(spec)}:{self.trim}:{self.normalize}:{self.level}:{self.resample}"
+        name = hashlib.sha1(params.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".pcm")
+
+    def duration(self, source_hash, spec):
+        """Duration of an already processed sample, None if it wasn't processed yet."""
+        if not self.directory:
+            return None
+        try:
+            size = os.path.getsize(self._path(source_hash, spec))
+        except OSError:
+            return None
+        return size / (spec.frame_size * spec.frequency)
+
+    def convert(self, source, spec):
+        samples, rate = read_wav(source)
+        samples = resample(remix(samples, spec.channels), rate, spec.frequency)
+        return from_float(samples, sample_dtype(spec.format)).tobytes()
+
+    def load(self, source_hash, spec, decode, source=None):
+        """Processed PCM for a sample, decode() returns its PCM on a cache miss.
+
+        :param source: source file, WAV files are converted here when resampling
+        """
+        path = self._path(source_hash, spec) if self.directory else None
+        if path and os.path.exists(path):
+            with open(path, "rb") as file:
+                return file.read()
+
+        if self.resample and source and source.lower().endswith(".wav"):
+            pcm = self.convert(source, spec)
+        else:
+            pcm = decode()
+        data = self.process(pcm, spec)
+        if path:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        return data
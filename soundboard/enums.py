@@ -22,3 +22,20 @@ class EventTypes(Enum):
 class ModifierTypes(Enum):
     floating = "floating"
     http = "http"
+
+
+class Priority(Enum):
+    local = 0
+    remote = 1
+
+
+class StealPolicy(Enum):
+    oldest = "oldest"
+    quietest = "quietest"
+    same_sound = "same_sound"
+
+
+class Overlap(Enum):
+    layer = "layer"
+    restart = "restart"
+    ignore = "ignore"
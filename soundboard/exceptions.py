@@ -13,3 +13,7 @@ class VoxException(SoundException):
     def __init__(self, msg, filename, sentence):
         SoundException.__init__(self, msg, filename)
         self.sentence = sentence
+
+
+class PlaybackBusy(Exception):
+    """Too many remote play requests are waiting."""
@@ -0,0 +1,78 @@
+"""Duration and layout of audio files read from their headers, without decoding."""
+import os
+import struct
+import wave
+from typing import NamedTuple
+
+from .exceptions import SoundException
+
+EXTENSIONS = (".wav", ".ogg", ".oga", ".opus", ".flac")
+OGG_TAIL = 1 << 16
+
+
+class format_info(NamedTuple):
+    duration: float
+    rate: int
+    channels: int
+
+
+def probe(path) -> format_info:
+    """:raises SoundException: for files that aren't WAV, Ogg (Vorbis/Opus) or FLAC, or are corrupt"""
+    try:
+        return _probe(path)
+    except (ValueError, EOFError, IndexError, struct.error, wave.Error) as e:
+        raise SoundException(str(e), path) from e
+
+
+def _probe(path):
+    with open(path, "rb") as file:
+        magic = file.read(4)
+        file.seek(0)
+        if magic == b"RIFF":
+            return probe_wav(file)
+        if magic == b"OggS":
+            return probe_ogg(file)
+        if magic == b"fLaC":
+            return probe_flac(file)
+    raise ValueError("unsupported audio file %s" % path)
+
+
+def probe_wav(file):
+    with wave.open(file) as wave_file:
+        rate = wave_file.getframerate()
+        return format_info(wave_file.getnframes() / rate, rate, wave_file.getnchannels())
+
+
+def probe_flac(file):
+    # STREAMINFO is always the first metadata block
+    file.seek(8 + 10)
+    packed, = struct.unpack(">Q", file.read(8))
+    rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    if not rate:
+        raise ValueError("invalid FLAC stream info")
+    return format_info(total_samples / rate, rate, channels)
+
+
+def probe_ogg(file):
+    header = file.read(27)
+    segments = file.read(header[26])
+    packet = file.read(sum(segments))
+    if packet.startswith(b"\x01vorbis"):
+        channels, rate = struct.unpack_from("<BI", packet, 11)
+        pre_skip, granule_rate = 0, rate
+    elif packet.startswith(b"OpusHead"):
+        channels, pre_skip, rate = struct.unpack_from("<BHI", packet, 9)
+        granule_rate = 48000  # opus granules always count 48 kHz samples
+    else:
+        raise ValueError("unsupported Ogg codec")
+
+    size = file.seek(0, os.SEEK_END)
+    file.seek(max(size - OGG_TAIL, 0))
+    tail = file.read()
+    last_page = tail.rfind(b"OggS")
+    if last_page < 0:
+        raise ValueError("no Ogg page in the last %d bytes" % OGG_TAIL)
+    granule, = struct.unpack_from("<q", tail, last_page + 6)
+    return format_info(max(granule - pre_skip, 0) / granule_rate, rate or granule_rate, channels)
@@ -1,4 +1,3 @@
-from queue import Queue
 from threading import Thread
 
 from flask import current_app
@@ -7,6 +6,10 @@ from flask import make_response
 from flask_restful import Api
 from flask_restful import Resource
 
+from . import latency
+from .controls.raw_controls import EventQueue
+from .exceptions import PlaybackBusy
+
 api = Api()
 
 
@@ -28,6 +31,12 @@ class SoundSet(Resource):
         return {"sounds": [s.name for s in sound_set.sounds.values()]}
 
 
+@api.resource("/traces")
+class Traces(Resource):
+    def get(self):
+        return {"traces": latency.traces()}
+
+
 @api.resource("/remote-input/<int:btn>/<int:state>", endpoint="remote")
 class Remote(Resource):
     def post(self, btn, state):
@@ -41,7 +50,10 @@ class Play(Resource):
         board = current_app.board
         sound_set = board.shared_online.get(set_name)
         sound = sound_set.sounds[sound_name]
-        sound.play(is_async=True)
+        try:
+            board.dispatcher.play(sound)
+        except PlaybackBusy:
+            return {"error": "too many sounds queued"}, 429
 
 
 class FlaskApp:
@@ -49,7 +61,7 @@ class FlaskApp:
         """:type board: soundboard.board.Board"""
         self.board = board
         self.settings = settings
-        self.queue = Queue()
+        self.queue = EventQueue()
 
         self.app = Flask(__name__)
         self.app.board = board
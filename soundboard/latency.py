@@ -0,0 +1,89 @@
+"""Press-to-audio latency traces.
+
+A trace starts when the first raw event of a press is read and collects a
+monotonic timestamp per stage on its way to the mixer. It travels with the
+press in a context variable, the dispatcher runs commands in the caller's
+context and the player keeps the trace of the sample it starts.
+"""
+from collections import deque
+from contextvars import ContextVar
+from threading import Lock
+from time import monotonic
+from time import time
+from typing import Deque
+
+from prometheus_client import Histogram
+
+STAGES = ("resolved", "dispatched", "lookup", "played")
+
+stage_seconds = Histogram(
+    "soundboard_press_stage_seconds",
+    "time from the previous stage of a button press",
+    ["stage", "sound_set"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+press_seconds = Histogram(
+    "soundboard_press_seconds",
+    "time from reading a button press to the mixer starting its sound",
+    ["sound_set"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5),
+)
+
+current: ContextVar = ContextVar("trace", default=None)
+recent: Deque["Trace"] = deque(maxlen=256)
+_lock = Lock()
+
+
+class Trace:
+    __slots__ = ("start", "wall", "stages", "sound_set", "sound", "done")
+
+    def __init__(self, start=None):
+        self.start = start or monotonic()
+        self.wall = time() - (monotonic() - self.start)
+        self.stages = []
+        self.sound_set = ""
+        self.sound = ""
+        self.done = False
+
+    def mark(self, stage):
+        self.stages.append((stage, monotonic()))
+
+    def finish(self):
+        """Records the trace, only the first sound started for a press counts."""
+        if self.done:
+            return
+        self.done = True
+        previous = self.start
+        for stage, timestamp in self.stages:
+            stage_seconds.labels(stage, self.sound_set).observe(timestamp - previous)
+            previous = timestamp
+        press_seconds.labels(self.sound_set).observe(previous - self.start)
+        with _lock:
+            recent.append(self)
+
+    def as_dict(self):
+        return {
+            "time": self.wall,
+            "sound_set": self.sound_set,
+            "sound": self.sound,
+            "stages": {stage: timestamp - self.start for stage, timestamp in self.stages},
+        }
+
+
+def start(timestamp=None):
+    """Starts a trace for the press being handled in this context."""
+    trace = Trace(timestamp)
+    current.set(trace)
+    return trace
+
+
+def mark(stage):
+    trace = current.get()
+    if trace:
+        trace.mark(stage)
+    return trace
+
+
+def traces():
+    with _lock:
+        return [trace.as_dict() for trace in recent]
@@ -16,6 +16,9 @@ from prometheus_client import start_http_server
 from soundboard.board import Board
 from soundboard.config import settings
 from soundboard.controls import Joystick
+from soundboard.controls.raw_controls import EventQueue
+from soundboard.controls.replay import Recorder
+from soundboard.exceptions import PlaybackBusy
 from soundboard.http import HTTPThread
 from soundboard.signals import mqtt_message
 from soundboard.mqtt import MQTT
@@ -35,7 +38,7 @@ def setup_signals(board: Board, mqtt: MQTT):
 
 
 def setup_mqtt_controller(board: Board, mqtt: MQTT):
-    mqtt_queue: Queue[Tuple[int, int]] = Queue()
+    mqtt_queue: Queue[Tuple[int, int]] = EventQueue()
     mqtt_joystick = Joystick(mqtt_queue, backend="queue")
 
     def joystick_cb(topic, msg):
@@ -47,6 +50,11 @@ def setup_mqtt_controller(board: Board, mqtt: MQTT):
     mqtt.add_topic_handler(MQTT_TOPIC_CONTROLLER, joystick_cb)
 
 
+def setup_mqtt(board: Board, mqtt: MQTT):
+    mqtt.add_topic_handler(MQTT_TOPIC_DANK, board.on_dankness)
+    setup_mqtt_controller(board, mqtt)
+
+
 def setup_http(board: Board):
     http = HTTPThread(board, settings)
     http.start()
@@ -71,10 +79,24 @@ class SoundboardServicer(proto_pb2_grpc.SoundboardServicer):
     def Play(self, request, context):
         sound_set = self.board.shared_online.get(request.set_name)
         sound = sound_set.sounds[request.sound_name]
-        sound.play(is_async=True)
+        try:
+            self.board.dispatcher.play(sound)
+        except PlaybackBusy:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "too many sounds queued")
         return proto_pb2.PlayResponse()
 
 
+def add_services(server, servicer):
+    proto_pb2_grpc.add_SoundboardServicer_to_server(servicer, server)
+    reflection.enable_server_reflection(
+        (
+            "soundboard.Soundboard",
+            reflection.SERVICE_NAME,
+        ), server,
+    )
+    server.add_insecure_port('[::]:50051')
+
+
 def main():
     os.environ["SDL_VIDEODRIVER"] = "dummy"
     if "--debug" in sys.argv:
@@ -86,11 +108,10 @@ def main():
         start_http_server(settings.prometheus_port)
 
     board = Board(settings)
-    for file in Path(settings.yaml_directory).glob("*.yaml"):
-        board.register_sound_set(yamlfile=file)
-
-    if settings.http:
-        setup_http(board)
+    board.load_sound_sets(
+        sorted(Path(settings.yaml_directory).glob("*.yaml")),
+        workers=settings.load_workers,
+    )
 
     if settings.device_path:
         joystick = Joystick(
@@ -98,22 +119,24 @@ def main():
             backend=settings.input_type,
             offset=settings.scancode_offset,
         )
+        if settings.record_input:
+            Recorder(settings.record_input).attach(joystick)
 
         board.register_joystick(joystick)
     else:
         logger.warning("no hardware soundboard")
 
+    if settings.runtime == "asyncio":
+        from soundboard import aio  # aiohttp is optional
+
+        aio.run(board, settings)
+        return
+
+    if settings.http:
+        setup_http(board)
+
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    proto_pb2_grpc.add_SoundboardServicer_to_server(
-        SoundboardServicer(board), server,
-    )
-    reflection.enable_server_reflection(
-        (
-            "soundboard.Soundboard",
-            reflection.SERVICE_NAME,
-        ), server,
-    )
-    server.add_insecure_port('[::]:50051')
+    add_services(server, SoundboardServicer(board))
     server.start()
 
     if settings.mqtt:
@@ -122,8 +145,7 @@ def main():
             login=settings.mqtt_login,
             password=settings.mqtt_password,
         )
-        mqtt.add_topic_handler(MQTT_TOPIC_DANK, board.on_dankness)
-        setup_mqtt_controller(board, mqtt)
+        setup_mqtt(board, mqtt)
     board.run()
 
 
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+from collections import defaultdict
+from threading import Lock
+from typing import Dict
+
+from . import formats
+from .types import sample_info
+
+logger = logging.getLogger("soundboard.manifest")
+
+
+def file_hash(path):
+    """sha1 of the file's content, what samples are keyed by."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Persistent record of sample metadata keyed by real path.
+
+    Files whose size and mtime did not change are never opened again, new or
+    modified ones are probed and the manifest is marked dirty until saved.
+    """
+
+    version = 1
+
+    def __init__(self, path=None):
+        self.path = path
+        self.records: Dict[str, sample_info] = {}
+        self.dirty = False
+        self.lock = Lock()
+        if path:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.warning("ignoring broken manifest %s: %s", self.path, e)
+            return
+
+        if data.get("version") != self.version:
+            return
+        self.records = {
+            path: sample_info(**record) for path, record in data["samples"].items()
+        }
+
+    def save(self):
+        with self.lock:
+            if not self.path or not self.dirty:
+                return
+            data = {
+                "version": self.version,
+                "samples": {path: r._asdict() for path, r in self.records.items()},
+            }
+            self.dirty = False
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self.path)
+        logger.info("saved manifest %s (%d samples)", self.path, len(data["samples"]))
+
+    def info(self, path) -> sample_info:
+        real_path = os.path.realpath(path)
+        stat = os.stat(real_path)
+        record = self.records.get(real_path)
+        if record and (record.size, record.mtime) == (stat.st_size, stat.st_mtime_ns):
+            return record
+
+        record = self.probe(real_path, stat)
+        with self.lock:
+            self.records[real_path] = record
+            self.dirty = True
+        return record
+
+    @staticmethod
+    def probe(path, stat) -> sample_info:
+        duration, rate, channels = formats.probe(path)
+        return sample_info(
+            stat.st_size, stat.st_mtime_ns, duration, rate, channels, file_hash(path),
+        )
+
+    def prune(self):
+        """Forgets samples that no longer exist, returns their paths."""
+        with self.lock:
+            missing = [path for path in self.records if not os.path.exists(path)]
+            for path in missing:
+                del self.records[path]
+            self.dirty |= bool(missing)
+        return missing
+
+    def duplicates(self):
+        """Groups of paths with identical content."""
+        by_hash = defaultdict(list)
+        with self.lock:
+            records = list(self.records.items())
+        for path, record in records:
+            by_hash[record.hash].append(path)
+        return [paths for paths in by_hash.values() if len(paths) > 1]
@@ -1,61 +1,369 @@
-import wave
+import abc
+import logging
+import os
 from collections import namedtuple
-from time import sleep
+from contextlib import contextmanager
+from ctypes import addressof
+from ctypes import byref
+from ctypes import c_int
+from ctypes import c_ubyte
+from ctypes import c_uint16
+from ctypes import string_at
+from functools import partial
+from threading import Lock
 
 from sdl2 import sdlmixer
 
+from .bank import Bank
+from .cache import SampleCache
 from .config import settings
+from .enums import StealPolicy
+from .manifest import Manifest
+from .player import Player
+from .render import normalize
+from .render import VoxRenderer
+from .types import audio_spec
 from .utils import Singleton
+from .voices import VoiceAllocator
+from soundboard.utils import audio_format
 from soundboard.utils import init_sdl
 
-chunk_tuple = namedtuple("chunk_info", "chunk duration")
+logger = logging.getLogger("soundboard.mixer")
 
+chunk_tuple = namedtuple("chunk_info", "chunk duration size data", defaults=(None,))
+
+
+class MixerMeta(Singleton, abc.ABCMeta):
+    pass
+
+
+class BaseMixer(metaclass=MixerMeta):
+    """Sample loading and caching shared by the mixer backends.
+
+    Backends provide the chunk type: decoding, playback, raw PCM access in
+    their output format (spec) and freeing.
+    """
 
-class SDLMixer(metaclass=Singleton):
     def __init__(self):
         super().__init__()
-        init_sdl()
-        self.chunks = {}
+        self.cache = SampleCache(
+            settings.sample_cache_size * 1024 * 1024,
+            free=self.free_chunk,
+            in_use=self.is_playing,
+        )
+        self.phrases = SampleCache(
+            settings.vox_cache_size * 1024 * 1024,
+            free=self.free_chunk,
+            in_use=self.is_playing,
+        )
+        self.renderer = VoxRenderer(
+            self, gap=settings.vox_gap, threshold=settings.vox_trim_threshold,
+        )
+        self.manifest = Manifest(self.manifest_path())
+        self.processor = self._processor()
+        self.allocator = VoiceAllocator(
+            settings.mixer_channels,
+            StealPolicy(settings.steal_policy),
+            playing=self.channel_playing,
+            loudness=self.loudness,
+        )
+        self.player = Player(self)
+
+    @abc.abstractmethod
+    def play(self, chunk, options=None):
+        """:rtype: bool, False if options.overlap says to ignore it"""
+        pass
+
+    @abc.abstractmethod
+    def is_playing(self, chunk):
+        pass
+
+    @abc.abstractmethod
+    def channel_playing(self, channel):
+        pass
+
+    def loudness(self, channel):
+        return 0
+
+    def free_chunk(self, chunk):
+        pass
+
+    @abc.abstractmethod
+    def spec(self):
+        """:rtype: audio_spec"""
+        pass
+
+    @abc.abstractmethod
+    def pcm(self, chunk):
+        pass
+
+    @abc.abstractmethod
+    def from_pcm(self, data):
+        """:type data: bytearray"""
+        pass
+
+    @abc.abstractmethod
+    def _decode(self, fs_path):
+        """:rtype: (chunk, size in bytes)"""
+        pass
 
     @staticmethod
-    def play(chunk):
-        if sdlmixer.Mix_PlayChannel(-1, chunk, 0) == -1:
-            raise Exception("Could not play chunk")
+    def manifest_path():
+        if settings.manifest_path:
+            return settings.manifest_path
+        if settings.wav_directory:
+            return os.path.normpath(settings.wav_directory) + ".manifest.json"
+        return None
+
+    @staticmethod
+    def _processor():
+        if not (settings.trim_silence or settings.normalize or settings.resample):
+            return None
+        from .dsp import SampleProcessor  # numpy is optional
+
+        directory = settings.processed_directory
+        if not directory and settings.wav_directory:
+            directory = os.path.normpath(settings.wav_directory) + ".processed"
+        return SampleProcessor(
+            directory,
+            trim=settings.trim_silence,
+            normalize=settings.normalize,
+            level=settings.normalize_level,
+            resample=settings.resample,
+        )
 
     def read(self, path):
-        chunk = self.chunks.get(path, self._load_chunk(path))
-        return RawSound(path, chunk, self)
+        info = self.manifest.info(path)
+        duration = info.duration
+        if self.processor:
+            duration = self.processor.duration(info.hash, self.spec())
+        load = partial(self._load_chunk, path, info)
+        sound = RawSound(path, info.hash, load, self, duration=duration)
+        if not settings.lazy_load:
+            sound.chunk
+        return sound
 
-    def _load_chunk(self, fs_path):
-        chunk = sdlmixer.Mix_LoadWAV(fs_path.encode("utf-8"))
-        wave_file = wave.open(fs_path)
-        duration = wave_file.getnframes() / wave_file.getframerate()
-        self.chunks[fs_path] = chunk_tuple(chunk, duration)
-        return self.chunks[fs_path]
+    def stream(self, path):
+        """Sample played without decoding it into memory, backends that can't stream load it."""
+        return self.read(path)
+
+    def render(self, base_dir, sentence):
+        """Renders a vox sentence into a single sample."""
+        key = base_dir, normalize(sentence)
+        load = partial(self.renderer.render, base_dir, sentence)
+        return RawSound(sentence, key, load, self, cache=self.phrases)
+
+    def duration(self, size):
+        spec = self.spec()
+        return size / (spec.frame_size * spec.frequency)
+
+    def _load_chunk(self, fs_path, info):
+        if self.processor:
+            return self._load_processed(fs_path, info)
+        chunk, size = self._decode(fs_path)
+        return chunk_tuple(chunk, info.duration, size)
+
+    def _load_processed(self, fs_path, info):
+        def decode():
+            chunk, _ = self._decode(fs_path)
+            pcm = self.pcm(chunk)
+            self.free_chunk(chunk)
+            return pcm
 
+        data = self.processor.load(info.hash, self.spec(), decode, source=fs_path)
+        return self.from_pcm(bytearray(data))
 
-class NOPMixer(SDLMixer):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.played = []
 
-    def play(self, sound):
-        self.played.append(sound.path)
-        chunk = sound.raw
-        if sdlmixer.Mix_PlayChannel(-1, chunk, 0) == -1:
+class SDLMixer(BaseMixer):
+    def __init__(self):
+        init_sdl(
+            settings.audio_frequency,
+            audio_format(settings.audio_format),
+            settings.audio_channels,
+            settings.audio_buffer,
+        )
+        sdlmixer.Mix_AllocateChannels(settings.mixer_channels)
+        super().__init__()
+        self.bank = None
+        if self.processor and settings.sample_bank:
+            # the bank holds samples as SDL converted them, not processed
+            logger.warning("not using sample bank %s with sample processing", settings.sample_bank)
+        else:
+            self.bank = Bank.open(settings.sample_bank, settings.wav_directory, self.spec())
+        self.music = None
+        self.music_lock = Lock()
+
+    def play(self, chunk, options=None):
+        if isinstance(chunk, StreamedSound):
+            return chunk.start()
+        allocation = self.allocator.allocate(chunk, options)
+        if allocation is None:
+            return False
+        channel, halt = allocation
+        for stolen in halt:
+            sdlmixer.Mix_HaltChannel(stolen)
+        if sdlmixer.Mix_PlayChannel(channel, chunk, 0) == -1:
+            self.allocator.release(channel)
             raise Exception("Could not play chunk")
-        sdlmixer.Mix_HaltChannel(-1)
+        return True
+
+    def channel_playing(self, channel):
+        return bool(sdlmixer.Mix_Playing(channel))
+
+    def loudness(self, channel):
+        chunk = sdlmixer.Mix_GetChunk(channel)
+        chunk_volume = sdlmixer.Mix_VolumeChunk(chunk, -1) if chunk else 0
+        return sdlmixer.Mix_Volume(channel, -1) * chunk_volume
+
+    def is_playing(self, chunk):
+        address = addressof(chunk.contents)
+        for channel in range(sdlmixer.Mix_AllocateChannels(-1)):
+            if not sdlmixer.Mix_Playing(channel):
+                continue
+            playing = sdlmixer.Mix_GetChunk(channel)
+            if playing and addressof(playing.contents) == address:
+                return True
+        return False
+
+    def free_chunk(self, chunk):
+        sdlmixer.Mix_FreeChunk(chunk)
+
+    def read(self, path):
+        entry = self.bank.lookup(path, self.manifest.info(path).hash) if self.bank else None
+        if entry:
+            load = partial(self._load_banked, entry)
+            return RawSound(path, ("bank", entry.offset), load, self, duration=entry.duration)
+        if settings.stream_threshold:
+            spec = self.spec()
+            size = self.manifest.info(path).duration * spec.frequency * spec.frame_size
+            if size > settings.stream_threshold * 1024 * 1024:
+                return self.stream(path)
+        return super().read(path)
+
+    def stream(self, path):
+        return StreamedSound(path, self, self.manifest.info(path).duration)
+
+    def start_music(self, stream, position=0):
+        """Streams from disk through Mix_Music, SDL plays one stream at a time."""
+        with self.music_lock:
+            self._free_music()
+            music = sdlmixer.Mix_LoadMUS(stream.path.encode("utf-8"))
+            if not music:
+                raise FileNotFoundError(2, "Could not load music", stream.path)
+            self.music = stream, music
+            if sdlmixer.Mix_PlayMusic(music, 0) == -1:
+                raise Exception("Could not play music")
+            if position:
+                sdlmixer.Mix_SetMusicPosition(position)
+        return True
+
+    def stop_music(self, stream):
+        with self.music_lock:
+            if self.music and self.music[0] is stream:
+                self._free_music()
+
+    def seek_music(self, stream, position):
+        with self.music_lock:
+            if self.music and self.music[0] is stream:
+                sdlmixer.Mix_SetMusicPosition(position)
+
+    def music_playing(self, stream):
+        with self.music_lock:
+            return bool(self.music and self.music[0] is stream and sdlmixer.Mix_PlayingMusic())
+
+    def _free_music(self):
+        if self.music:
+            sdlmixer.Mix_HaltMusic()
+            sdlmixer.Mix_FreeMusic(self.music[1])
+            self.music = None
+
+    def spec(self):
+        frequency, fmt, channels = c_int(), c_uint16(), c_int()
+        sdlmixer.Mix_QuerySpec(byref(frequency), byref(fmt), byref(channels))
+        return audio_spec(frequency.value, fmt.value, channels.value)
+
+    def pcm(self, chunk):
+        return string_at(chunk.contents.abuf, chunk.contents.alen)
+
+    def from_pcm(self, data):
+        buffer = (c_ubyte * len(data)).from_buffer(data)
+        chunk = sdlmixer.Mix_QuickLoad_RAW(buffer, len(data))
+        return chunk_tuple(chunk, self.duration(len(data)), len(data), buffer)
+
+    def _load_banked(self, entry):
+        chunk, buffer = self.bank.load(entry)
+        # the samples stay in the (shared) page cache, only the Mix_Chunk is allocated
+        return chunk_tuple(chunk, entry.duration, 0, buffer)
+
+    def _decode(self, fs_path):
+        chunk = sdlmixer.Mix_LoadWAV(fs_path.encode("utf-8"))
+        if not chunk:
+            raise FileNotFoundError(2, "Could not load chunk", fs_path)
+        return chunk, chunk.contents.alen
 
 
 class RawSound:
-    def __init__(self, path, chunk, mixer):
+    def __init__(self, path, key, load, mixer, cache=None, duration=None):
+        """:param duration: known duration, the chunk is only loaded on first use then"""
+        self.path = path
+        self.key = key
+        self.load = load
+        self.mixer = mixer
+        self.cache = cache or mixer.cache
+        self.duration = self.chunk.duration if duration is None else duration
+
+    @property
+    def chunk(self):
+        return self.cache.get(self.key, self.load)
+
+    @property
+    def raw(self):
+        return self.chunk.chunk
+
+    @contextmanager
+    def use(self):
+        """The raw chunk, not freed until the block ends."""
+        with self.cache.use(self.key, self.load) as entry:
+            yield entry.chunk
+
+    def play(self, duration_const=0, voice=None, options=None):
+        return self.mixer.player.play([self], duration_const, voice=voice, options=options)
+
+
+class StreamedSound:
+    """Long sample decoded while it plays, stands in for a RawSound.
+
+    Nothing is loaded until it starts, the player hands it to the mixer as
+    its own raw chunk.
+    """
+
+    def __init__(self, path, mixer, duration):
         self.path = path
-        self.duration = chunk.duration
-        self.raw = chunk.chunk
         self.mixer = mixer
+        self.duration = duration
+        self.position = 0
+
+    @property
+    def raw(self):
+        return self
+
+    @contextmanager
+    def use(self):
+        yield self
+
+    def play(self, duration_const=0, voice=None, options=None):
+        return self.mixer.player.play([self], duration_const, voice=voice, options=options)
+
+    def start(self):
+        return self.mixer.start_music(self, self.position)
+
+    def stop(self):
+        self.mixer.stop_music(self)
+
+    def seek(self, position):
+        """:param position: seconds from the start"""
+        self.mixer.seek_music(self, position)
 
-    def play(self, duration_const=0, is_async=False):
-        self.mixer.play(self.raw)
-        if is_async:
-            return
-        sleep((self.duration + duration_const) - settings.sound_sleep_offset)
+    @property
+    def playing(self):
+        return self.mixer.music_playing(self)
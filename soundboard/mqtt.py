@@ -40,11 +40,14 @@ class MQTT:
         print("mqtt", topic, message)
         self.mqtt_client.publish(topic, message)
 
-    def _setup_mqtt(self):
+    def _create_client(self):
         self.mqtt_client = mqtt.Client()
         self.mqtt_client.username_pw_set(self.login, self.password)
         self.mqtt_client.on_connect = self._on_connect
         self.mqtt_client.on_log = self._on_log
         self.mqtt_client.on_message = self._on_message
+
+    def _setup_mqtt(self):
+        self._create_client()
         self.mqtt_client.connect_async(self.server, 1883, 60)
         self.mqtt_client.loop_start()
@@ -0,0 +1,139 @@
+import logging
+from collections import deque
+from concurrent.futures import Future
+from heapq import heappop
+from heapq import heappush
+from itertools import count
+from threading import Condition
+from threading import Thread
+from time import monotonic
+
+from . import latency
+from .config import settings
+from .enums import Overlap
+
+logger = logging.getLogger("soundboard.player")
+
+
+class Player(Thread):
+    """Plays samples queued per voice from a single timer thread.
+
+    Samples queued on the same voice play one after another, a voice of None
+    plays on its own. Every `play` call returns a future that is resolved
+    (from the timer thread) once its last sample has finished, with False if
+    the mixer ignored it because of its overlap mode.
+
+    Timers follow clock, a mixer rendering faster than real time replaces it
+    with its sample clock and calls tick when it moves.
+    """
+
+    main = "main"
+    clock = staticmethod(monotonic)
+
+    def __init__(self, mixer):
+        super().__init__()
+        self.daemon = True
+        self.mixer = mixer
+        self.voices = {}
+        self.timers = []
+        self.counter = count()
+        self.condition = Condition()
+
+    def play(self, samples, duration_const=0, voice=None, options=None):
+        """:param options: play_options for the first sample, the rest is layered onto it"""
+        future = Future()
+        layered = options._replace(overlap=Overlap.layer) if options else None
+        trace = latency.current.get()
+        steps = [
+            (sample, duration_const, options, trace) if not i else (sample, duration_const, layered, None)
+            for i, sample in enumerate(samples)
+        ]
+        steps.append((None, future, None, None))
+
+        with self.condition:
+            if voice is None:
+                voice = object()
+            queue = self.voices.get(voice)
+            if queue is None:
+                queue = self.voices[voice] = deque()
+                self._schedule(self.clock(), voice)
+            queue.extend(steps)
+            if not self.is_alive():
+                self.start()
+            self.condition.notify()
+        return future
+
+    def busy(self, voice):
+        return voice in self.voices
+
+    def next_due(self):
+        """When the first timer fires on clock, None if nothing is scheduled."""
+        with self.condition:
+            return self.timers[0][0] if self.timers else None
+
+    def tick(self):
+        with self.condition:
+            self.condition.notify()
+
+    def _schedule(self, due, voice):
+        heappush(self.timers, (due, next(self.counter), voice))
+
+    def run(self):
+        while True:
+            with self.condition:
+                finished = self._wait()
+            for future, played, error in finished:
+                if error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(played)
+
+    def _wait(self):
+        while True:
+            if not self.timers:
+                self.condition.wait()
+                continue
+            due, _, voice = self.timers[0]
+            delay = due - self.clock()
+            if delay > 0:
+                self.condition.wait(delay)
+                continue
+            heappop(self.timers)
+            finished = self._advance(voice)
+            if finished:
+                return finished
+
+    def _advance(self, voice):
+        finished = []
+        error = None
+        skipped = False
+        queue = self.voices[voice]
+        while queue:
+            sample, arg, options, trace = queue.popleft()
+            if sample is None:
+                finished.append((arg, not skipped, error))
+                error = None
+                skipped = False
+                continue
+            if error or skipped:
+                continue
+            try:
+                # pinned, a load on another thread must not free it before it plays
+                with sample.use() as raw:
+                    played = self.mixer.play(raw, options)
+                if played is False:
+                    skipped = True  # overlap says ignore, drop the rest too
+                    continue
+                if trace:
+                    trace.mark("played")
+                    trace.finish()
+            except Exception as e:
+                logger.exception(e)
+                error = e
+                continue
+            delay = (sample.duration + arg) - settings.sound_sleep_offset
+            self._schedule(self.clock() + max(delay, 0), voice)
+            return finished
+
+        del self.voices[voice]
+        return finished
@@ -0,0 +1,67 @@
+import os
+import sys
+from array import array
+
+from sdl2.audio import SDL_AUDIO_BITSIZE
+from sdl2.audio import SDL_AUDIO_ISBIGENDIAN
+from sdl2.audio import SDL_AUDIO_ISFLOAT
+from sdl2.audio import SDL_AUDIO_ISSIGNED
+
+from .vox import voxify
+
+
+def normalize(sentence):
+    return " ".join(sentence.lower().split())
+
+
+class VoxRenderer:
+    """Joins vox word samples into a single buffer in the mixer's format."""
+
+    def __init__(self, mixer, gap=0, threshold=0):
+        """
+        :param gap: silence between words in msec
+        :param threshold: trailing samples of a word with a smaller peak are dropped
+        """
+        self.mixer = mixer
+        self.gap = gap
+        self.threshold = threshold
+
+    def render(self, base_dir, sentence):
+        spec = self.mixer.spec()
+        words = [
+            self.mixer.read(os.path.join(base_dir, path))
+            for path in voxify(normalize(sentence))
+        ]
+        pcm = []
+        for word in words:
+            with word.use() as raw:
+                pcm.append(self.trim(self.mixer.pcm(raw), spec))
+        return self.mixer.from_pcm(bytearray(self.silence(spec).join(pcm)))
+
+    def silence(self, spec):
+        frames = int(spec.frequency * self.gap / 1000)
+        bits = SDL_AUDIO_BITSIZE(spec.format)
+        if SDL_AUDIO_ISSIGNED(spec.format) or SDL_AUDIO_ISFLOAT(spec.format):
+            value = 0
+        else:
+            value = 1 << (bits - 1)
+        byteorder = "big" if SDL_AUDIO_ISBIGENDIAN(spec.format) else "little"
+        return value.to_bytes(bits // 8, byteorder) * spec.channels * frames
+
+    def trim(self, pcm, spec):
+        """Drops trailing silence, only signed 16-bit formats are supported."""
+        is_s16 = SDL_AUDIO_BITSIZE(spec.format) == 16 and SDL_AUDIO_ISSIGNED(spec.format)
+        if not self.threshold or not is_s16:
+            return pcm
+
+        samples = array("h", pcm)
+        if bool(SDL_AUDIO_ISBIGENDIAN(spec.format)) != (sys.byteorder == "big"):
+            samples.byteswap()
+
+        end = len(samples)
+        while end and abs(samples[end - 1]) <= self.threshold:
+            end -= 1
+        if not end:
+            return pcm  # all quiet, SDL refuses to play empty chunks
+        end += -end % spec.channels
+        return pcm[:end * samples.itemsize]
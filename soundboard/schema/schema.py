@@ -5,9 +5,12 @@ from marshmallow import pre_load
 from marshmallow import Schema
 from marshmallow import validates
 from marshmallow import ValidationError
+from marshmallow.validate import OneOf
 
 from .fields import Frozenset
 from soundboard.enums import ModifierTypes
+from soundboard.enums import Overlap
+from soundboard.enums import StealPolicy
 
 
 class SettingsMixin:
@@ -24,6 +27,8 @@ class SoundSchema(Schema):
     type = fields.Str(required=True)
     dank = fields.Boolean(missing=False)
     is_async = fields.Boolean(missing=False)
+    group = fields.Str(missing=None)
+    overlap = fields.Str(missing=Overlap.layer.value, validate=OneOf([o.value for o in Overlap]))
     attributes = fields.Dict(required=True)
 
     @pre_load
@@ -67,6 +72,9 @@ class SoundSet(Schema, SettingsMixin):
     delay_multiplier = fields.Float(required=True)
     sounds = fields.Nested(SoundSchema, many=True, required=True)
     startup = fields.Nested(StartupSchema)
+    channels = fields.Int(missing=0)
+    steal = fields.Str(missing=None, validate=OneOf([p.value for p in StealPolicy]))
+    channel_groups = fields.Dict(keys=fields.Str(), values=fields.Int(), missing=dict)
 
     @validates("modifiers")
     def validate_modifiers(self, mods):
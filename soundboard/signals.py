@@ -3,3 +3,7 @@ from blinker import Namespace
 ns = Namespace()
 
 mqtt_message = ns.signal('mqtt-message')
+api_updated = ns.signal('api-updated')
+api_created = ns.signal('api-created')
+# sent with the sound whose playback was stopped before it ended
+sound_stopped = ns.signal('sound-stopped')
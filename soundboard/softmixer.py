@@ -0,0 +1,192 @@
+import logging
+import wave
+from threading import Condition
+from threading import Thread
+from time import monotonic
+from time import perf_counter
+from time import sleep
+
+import numpy as np
+from prometheus_client import Histogram
+from sdl2.audio import AUDIO_S16SYS
+
+from . import dsp
+from .config import settings
+from .mixer import BaseMixer
+from .mixer import chunk_tuple
+from .types import audio_spec
+
+logger = logging.getLogger("soundboard.softmixer")
+
+mix_seconds = Histogram(
+    "soundboard_software_mix_seconds",
+    "time spent mixing one block",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025),
+)
+
+
+class NullSink:
+    def write(self, block):
+        pass
+
+    def close(self):
+        pass
+
+
+class WavSink:
+    def __init__(self, path, spec):
+        self.file = wave.open(path, "wb")
+        self.file.setnchannels(spec.channels)
+        self.file.setsampwidth(2)
+        self.file.setframerate(spec.frequency)
+
+    def write(self, block):
+        self.file.writeframes(block.tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+def read_wav(path, spec):
+    """Decodes a PCM WAV file to int16 frames in the given output format."""
+    samples, rate = dsp.read_wav(path)
+    samples = dsp.resample(dsp.remix(samples, spec.channels), rate, spec.frequency)
+    return dsp.from_float(samples, np.dtype(np.int16))
+
+
+class SoftwareMixer(BaseMixer):
+    """Mixes active voices with NumPy, no audio device needed.
+
+    Voices are mixed in blocks of block_size frames into a float32 buffer
+    and written to a WAV file or discarded. In realtime mode blocks are
+    produced at the output rate like a sound card would consume them.
+    Otherwise they are produced as fast as possible while anything is
+    playing or scheduled, and the player runs on the mixed frames so gaps
+    between samples are rendered as they would sound; idle time is skipped.
+    """
+
+    def __init__(self, output=None, realtime=True, block_size=1024):
+        # mixing happens in int16, only rate and channel count are configurable
+        self._spec = audio_spec(settings.audio_frequency, AUDIO_S16SYS, settings.audio_channels)
+        self.voices = [None] * settings.mixer_channels
+        super().__init__()
+        self.block_size = block_size
+        self.realtime = realtime
+        self.sink = WavSink(output, self._spec) if output else NullSink()
+        self.blocks = 0
+        self.mix_time = 0.0
+        self.max_mix_time = 0.0
+        self.condition = Condition()
+        if not realtime:
+            self.player.clock = self.clock
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def spec(self):
+        return self._spec
+
+    def play(self, chunk, options=None):
+        with self.condition:
+            allocation = self.allocator.allocate(chunk, options)
+            if allocation is None:
+                return False
+            channel, halt = allocation
+            for stolen in halt:
+                self.voices[stolen] = None
+            self.voices[channel] = [chunk, 0]
+            self.condition.notify()
+        return True
+
+    def is_playing(self, chunk):
+        with self.condition:
+            return any(voice and voice[0] is chunk for voice in self.voices)
+
+    def clock(self):
+        """Seconds of output mixed so far."""
+        return self.blocks * self.block_size / self._spec.frequency
+
+    def _wait_for_work(self):
+        """Returns once something plays or is scheduled and the player caught up with the clock."""
+        while True:
+            due = self.player.next_due()
+            if due is not None and due <= self.clock():
+                # the player doesn't notify after its timers, look again shortly
+                self.condition.wait(0.001)
+            elif due is None and not any(self.voices):
+                # everything starts with play(), which notifies
+                self.condition.wait()
+            else:
+                return
+
+    def channel_playing(self, channel):
+        return self.voices[channel] is not None
+
+    def loudness(self, channel):
+        chunk, position = self.voices[channel]
+        return np.abs(chunk[position:position + self.block_size]).mean() if position < len(chunk) else 0
+
+    def pcm(self, chunk):
+        return chunk.tobytes()
+
+    def from_pcm(self, data):
+        chunk = np.frombuffer(data, np.int16).reshape(-1, self._spec.channels)
+        return chunk_tuple(chunk, self.duration(len(data)), len(data), data)
+
+    def _decode(self, fs_path):
+        chunk = read_wav(fs_path, self._spec)
+        return chunk, chunk.nbytes
+
+    @property
+    def stats(self):
+        """Blocks mixed, mean and worst mixing time per block in seconds."""
+        mean = self.mix_time / self.blocks if self.blocks else 0
+        return {"blocks": self.blocks, "mean": mean, "max": self.max_mix_time}
+
+    def mix(self):
+        """Mixes the next block of all active voices, returns int16 frames."""
+        out = np.zeros((self.block_size, self._spec.channels), dtype=np.float32)
+        with self.condition:
+            for channel, voice in enumerate(self.voices):
+                if not voice:
+                    continue
+                chunk, position = voice
+                piece = chunk[position:position + self.block_size]
+                out[:len(piece)] += piece
+                voice[1] += self.block_size
+                if voice[1] >= len(chunk):
+                    self.voices[channel] = None
+        np.clip(out, -32768, 32767, out=out)
+        return out.astype(np.int16)
+
+    def run(self):
+        block_duration = self.block_size / self._spec.frequency
+        next_block = monotonic()
+        while True:
+            if not self.realtime:
+                with self.condition:
+                    self._wait_for_work()
+
+            started = perf_counter()
+            block = self.mix()
+            elapsed = perf_counter() - started
+            self.blocks += 1
+            self.mix_time += elapsed
+            self.max_mix_time = max(self.max_mix_time, elapsed)
+            mix_seconds.observe(elapsed)
+            if elapsed > block_duration:
+                logger.warning("mixing a block took %.1f ms, longer than it plays", elapsed * 1000)
+
+            self.sink.write(block)
+            if not self.realtime:
+                self.player.tick()
+            if self.realtime:
+                next_block += block_duration
+                sleep(max(next_block - monotonic(), 0))
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            output=settings.software_output,
+            realtime=settings.software_realtime,
+            block_size=settings.software_block_size,
+        )
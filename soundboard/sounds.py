@@ -5,23 +5,34 @@ import os
 import random
 import re
 import socket
+from collections import defaultdict
+from concurrent.futures import Future
 from threading import Thread
-from time import sleep
 from time import time
+from typing import Optional
 from typing import Type
 
-import requests
 from prometheus_client import Counter
 
 from . import config
+from . import latency
 from . import utils
+from .client_api import DepartureApi
 from .client_api import JSONApi
+from .client_api import session
 from .exceptions import SoundException
 from .exceptions import VoxException
 from .mixer import SDLMixer
+from .player import Player
+from .enums import Overlap
+from .enums import StealPolicy
+from .types import play_options
 from .types import sound_state
-from .vox import voxify
+from .utils import bitmask
+from .utils import bits
+from .signals import api_updated
 from .signals import mqtt_message
+from .signals import sound_stopped
 from .defines import WEATHER_URL
 
 logger = logging.getLogger("soundboard.sounds")
@@ -94,6 +105,7 @@ class SoundInterface(metaclass=SoundMeta):
 
 class Sound(SoundInterface):
     running = False
+    voice: Optional[str] = Player.main
 
     def __init__(self, mixer: SDLMixer, base_dir, data=None):
         self.mixer = mixer
@@ -101,6 +113,7 @@ class Sound(SoundInterface):
         self.name = "I'm so unnammed"
         self.current_sample = None
         self.duration_const = 0
+        self.play_options = play_options(key=self)
 
         if data:
             self.setup(data)
@@ -142,22 +155,34 @@ class Sound(SoundInterface):
         sample = next(sample for sample in map(self.signal, signals) if sample)
         return sample
 
+    def _voice(self, is_async):
+        return None if is_async else self.voice
+
     def play(self, is_async=False, **kwargs):
+        """:rtype: concurrent.futures.Future"""
 
         logger.info("playing %s", self.name)
         self.current_sample = self._obtain_sample()
-        self.current_sample.play(self.duration_const, is_async=is_async)
+        future = self.current_sample.play(
+            self.duration_const, voice=self._voice(is_async), options=self.play_options,
+        )
         self.running = True
+        return future
 
     def play_all(self, is_async=False):
-        for sample in self.samples:
-            sample.play(self.duration_const, is_async=is_async)
+        return self.mixer.player.play(
+            self.samples,
+            self.duration_const,
+            voice=self._voice(is_async),
+            options=self.play_options,
+        )
 
     def end(self):
         self.running = False
         sample = self.signal("end")
         if sample:
-            return sample.play()  # noqa
+            options = self.play_options._replace(overlap=Overlap.layer)
+            return sample.play(voice=self.voice, options=options)  # noqa
 
 
 # https://stackoverflow.com/questions/3862310/how-can-i-find-all-subclasses-of-a-given-class-in-python
@@ -176,6 +201,48 @@ class SimpleSound(Sound):
         return self.samples[0].duration
 
 
+@config.state.sounds.register
+class StreamSound(Sound):
+    """Long track played straight from disk, clicking it again stops it.
+
+    Sounds start on a click, once their keys are released, so
+    stop_on_release stops the track right after it started: only useful to
+    preview the start of a track.
+    """
+
+    name = "stream"
+    voice = None  # must not hold up other sounds for minutes
+
+    def setup(self, path, start=0, stop_on_release=False):
+        self.start = start
+        self.stop_on_release = stop_on_release
+        try:
+            self.samples = [self.mixer.stream(os.path.join(self.dir, path))]
+        except FileNotFoundError as e:
+            raise SoundException(e.strerror, e.filename) from e
+
+    def play(self, is_async=False):
+        sample = self.samples[0]
+        if getattr(sample, "playing", False):  # mixers that can't stream load it
+            sample.stop()
+            sound_stopped.send(self)
+            stopped: Future = Future()
+            stopped.set_result(True)
+            return stopped
+        sample.position = self.start
+        return super().play(is_async=is_async)
+
+    def seek(self, position):
+        self.samples[0].seek(position)
+
+    def end(self):
+        self.running = False
+        stop = getattr(self.samples[0], "stop", None)  # mixers that can't stream load it
+        if self.stop_on_release and stop:
+            stop()
+            sound_stopped.send(self)
+
+
 @config.state.sounds.register
 class RandomSound(Sound):
     name = "random"
@@ -219,19 +286,66 @@ class VoxSound(Sound):
     vox_duration_const = 0.15
 
     def setup(self, sentence):
+        self.duration_const = self.vox_duration_const
         try:
-            super().setup(
-                voxify(sentence.lower()), duration_const=self.vox_duration_const,
-            )
-        except SoundException as e:
-            raise VoxException(e.msg, e.filename, sentence) from e
+            self.samples = [self.mixer.render(self.dir, sentence)]
+        except FileNotFoundError as e:
+            raise VoxException(e.strerror, e.filename, sentence) from e
 
-    def play(self):
-        super().play_all()
+    def play(self, is_async=False):
+        return super().play_all(is_async=is_async)
+
+
+class ApiSound(Sound):
+    """Speaks data its api client keeps fresh in the background.
+
+    The announcement is rendered whenever the client fetches new data, so
+    playing it costs as much as a SimpleSound. Playing never touches the
+    network, without usable data it says settings.api_unavailable_sentence.
+    """
+
+    announcement = None
+
+    def to_sentence(self, data):
+        raise NotImplementedError
+
+    def setup_api(self, api):
+        self.api = api
+        api_updated.connect(self.prerender, sender=api)
+        self.prerender(api)
+
+    def prerender(self, api, **kwargs):
+        req = api.cached()
+        if req.status != api.OK:
+            return
+        try:
+            sound = self._vox(self.to_sentence(req.data))
+        except VoxException as e:
+            logger.error("could not render %s: %s", self.name, e)
+            return
+        self.announcement = req.data, sound
+
+    def _vox(self, sentence):
+        sound = VoxSound(mixer=self.mixer, base_dir=self.dir)
+        sound.setup(sentence)
+        return sound
+
+    def play(self, is_async=False):
+        req = self.api.cached()
+        announcement = self.announcement
+        if req.status == self.api.OK and announcement and announcement[0] is req.data:
+            sound = announcement[1]
+        elif req.status == self.api.OK:
+            sound = self._vox(self.to_sentence(req.data))
+        else:
+            logger.warning("%s has no data to play, last status %s", self.api.url, self.api.status)
+            sound = self._vox(self.settings.api_unavailable_sentence)
+        sound.play_options = self.play_options
+        return sound.play(is_async=is_async)
 
 
 @config.state.sounds.register
-class WeatherSound(Sound):
+class WeatherSound(ApiSound):
     name = "weather"
     sentence = "topside temperature is %s degrees"
     below_zero = "sub zero"
@@ -241,12 +355,14 @@ class WeatherSound(Sound):
         interval = interval or self.settings.weather_interval
         api_key = self.settings.openweather_api_key
 
-        self.api = JSONApi(
-            WEATHER_URL,
-            id=location_id,
-            units="metric",
-            appid=api_key,
-            _interval=interval,
+        self.setup_api(
+            JSONApi(
+                WEATHER_URL,
+                id=location_id,
+                units="metric",
+                appid=api_key,
+                _interval=interval,
+            ),
         )
 
     @classmethod
@@ -254,34 +370,27 @@ class WeatherSound(Sound):
         text = cls.sentence + " " + (cls.below_zero if temperature < 0 else "")
         return text % abs(temperature)
 
-    def play(self):
-        sound = VoxSound(mixer=self.mixer, base_dir=self.dir)
-        req = self.api.get()
-        if req.status != JSONApi.OK:
-            logger.critical(req)
-            sound.setup(req.status)
-        else:
-            temperature = req.data.get("main", {}).get("temp")
-            self.temperature = temperature
-            sentence = self._weather2text(temperature)
-            sound.setup(sentence)
-        sound.play()
+    def to_sentence(self, data):
+        self.temperature = data.get("main", {}).get("temp")
+        return self._weather2text(self.temperature)
 
 
 @config.state.sounds.register
-class ZTMSound(Sound):
+class ZTMSound(ApiSound):
     name = "ztm"
 
     def setup(self, line, stop, direction):
         jakdojade_url = self.settings.jakdojade_url
         self.line, self.stop, self.direction = line, stop, direction
 
-        self.api = JSONApi(
-            jakdojade_url,
-            line=self.line,
-            stop=self.stop,
-            direction=self.direction,
-            _cacheme=False,
+        self.setup_api(
+            DepartureApi(
+                jakdojade_url,
+                line=self.line,
+                stop=self.stop,
+                direction=self.direction,
+                _interval=self.settings.ztm_interval,
+            ),
         )
 
     @staticmethod
@@ -322,16 +431,8 @@ class ZTMSound(Sound):
 
         return sentence.format(line=line, h=hours, m=minutes)
 
-    def play(self):
-        sound = VoxSound(mixer=self.mixer, base_dir=self.dir)
-        req = self.api.get()
-        if req.status != JSONApi.OK:
-            logger.critical(req)
-            sound.setup(req.status)
-        else:
-            sentence = self._ztm2text(req.data)
-            sound.setup(sentence)
-        sound.play()
+    def to_sentence(self, data):
+        return self._ztm2text(data)
 
 
 @config.state.sounds.register
@@ -348,20 +449,16 @@ class PopeSound(Sound):
 
     def play(self, is_async=False):
         self.pope_start()
-        self.sound.play(is_async=False)  # TODO: fixme :3
-        self.pope_stop()
+        self.sound.play_options = self.play_options
+        future = self.sound.play(is_async=is_async)
+        future.add_done_callback(lambda _: self.pope_stop())
+        return future
 
     def pope_start(self):
-        def func():
-            sleep(self.delay)
-            url = self.pope_api.format(op="on")
-            requests.get(url)
-
-        Thread(target=func).start()
+        return session.fire(self.pope_api.format(op="on"), delay=self.delay)
 
     def pope_stop(self):
-        url = self.pope_api.format(op="off")
-        requests.get(url)
+        return session.fire(self.pope_api.format(op="off"))
 
     def handle_prometheus(self, board_name):
         rotation_time = self.sound.duration - self.delay
@@ -428,9 +525,13 @@ class SoundSet:
     def __init__(self, config=None, base_sound_factory=None):
 
         self.startup_sound = None
+        self.preloaded = False
 
         self.busy_time = time()
         self.combinations = {}
+        # combinations no longer combination contains, they can fire without waiting
+        self.final_combinations = set()
+        self.by_button = defaultdict(list)
         self.sounds = {}
         self.dank_sounds = set()
         self.async_sounds = set()
@@ -447,6 +548,7 @@ class SoundSet:
         self.name = config["name"]
         self.keys = config["keys"]
         self.modifiers = config.get("modifiers", list())
+        self._add_channel_groups(config)
         self._load_sounds(config)
 
     @classmethod
@@ -466,7 +568,9 @@ class SoundSet:
             name = soundentry["name"]
             dank = soundentry["dank"]
             is_async = soundentry["is_async"]
-            self.combinations[keys] = sound
+            self.combinations[bitmask(keys)] = sound
+            for button in keys:
+                self.by_button[button].append(sound)
             if name in self.sounds:
                 raise ValueError("%s sound %s already defined", self.name, name)
             self.sounds[name] = sound
@@ -476,30 +580,58 @@ class SoundSet:
             if is_async:
                 self.async_sounds.add(sound)
 
+        self.final_combinations = {
+            mask for mask in self.combinations
+            if not any(other != mask and other & mask == mask for other in self.combinations)
+        }
+
+    def _add_channel_groups(self, config):
+        """The set's own group is capped at channels, sounds join it unless they name another."""
+        allocator = self.sounds_factory.mixer.allocator
+        steal = config.get("steal")
+        steal = StealPolicy(steal) if steal else None
+        if config.get("channels"):
+            allocator.add_group(self.name, config["channels"], steal)
+        for group, cap in config.get("channel_groups", {}).items():
+            allocator.add_group(group, cap, steal)
+
     def _create_sound(self, sound_cfg):
         sound = self.sounds_factory.by_name(sound_cfg["type"])
         attributes = sound_cfg["attributes"]
         if "name" in sound_cfg:
             sound.name = sound_cfg["name"]
         sound.setup(**attributes)
+        sound.play_options = play_options(
+            group=sound_cfg.get("group") or self.name,
+            overlap=Overlap(sound_cfg.get("overlap", Overlap.layer.value)),
+            key=sound,
+        )
         return sound
 
     def on_activate(self):
+        if config.settings.lazy_load and not self.preloaded:
+            self.preloaded = True
+            Thread(target=self.preload, daemon=True).start()
         if self.startup_sound:
             self.startup_sound.play()
 
+    def preload(self):
+        """Decodes all samples of this set into the mixer cache."""
+        for sound in self.sounds.values():
+            for sample in getattr(sound, "samples", ()):
+                sample.chunk
+
     def sound_name(self, sound):
         for k, v in self.sounds.items():
             if v is sound:
                 return k
         raise ValueError("Sound not found")
 
-    def play(self, buttons, prometheus=False, board_state=None):
+    def play(self, buttons: int, prometheus=False, board_state=None):
         board_state = board_state or dict()
         if not buttons:
             return
 
-        buttons = frozenset(buttons)
         sound = self.combinations.get(buttons)
         if not sound:
             return
@@ -508,6 +640,10 @@ class SoundSet:
             sound = self.sounds_factory.by_name("vox")
             sound.setup("access denied")
 
+        trace = latency.mark("lookup")
+        if trace:
+            trace.sound_set, trace.sound = self.name, sound.name
+
         if sound in self.async_sounds:
             sound.play(is_async=True)
         else:
@@ -523,7 +659,10 @@ class SoundSet:
                 {"sound_set": self.name, "sound_name": sound_name},
             ).inc()
 
-    def stop(self, released_buttons):
-        for (buttons, sound) in self.combinations.items():
-            if released_buttons & buttons and sound.running:
-                sound.end()
+    def stop(self, released_buttons: int):
+        stopped = set()
+        for button in bits(released_buttons):
+            for sound in self.by_button.get(button, ()):
+                if sound.running and sound not in stopped:
+                    stopped.add(sound)
+                    sound.end()
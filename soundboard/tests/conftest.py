@@ -1,5 +1,16 @@
+import json
+import os
+from time import perf_counter
+from typing import Dict
+
 import pytest
 
+# seconds per call by benchmark key
+benchmark_results: Dict[str, float] = {}
+
+# timings are machine specific, the first run on a machine records them
+default_baseline = os.path.join(os.path.dirname(__file__), ".benchmarks.json")
+
 
 def pytest_addoption(parser):
     parser.addoption(
@@ -14,9 +25,38 @@ def pytest_addoption(parser):
         help="run joystick tests",
     )
 
+    parser.addoption(
+        "--benchmark", action="store_true", default=False, help="run benchmarks only",
+    )
+    parser.addoption(
+        "--benchmark-baseline",
+        default=default_baseline,
+        help="timings benchmarks are compared against, benchmarks missing from it are recorded",
+    )
+    parser.addoption(
+        "--benchmark-save",
+        action="store_true",
+        default=False,
+        help="write the timings of this run to the baseline",
+    )
+    parser.addoption(
+        "--benchmark-tolerance",
+        type=float,
+        default=0.25,
+        help="fail benchmarks slower than the baseline by more than this fraction",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "interactive: needs a human, run with --interactive")
+    config.addinivalue_line("markers", "joystick_plugged_in: needs a joystick, run with --joystick")
+    config.addinivalue_line("markers", "benchmark: timed against the baseline, run with --benchmark")
+
 
 def pytest_runtest_setup(item):
     is_interactive = "interactive" in item.keywords
+    is_benchmark = "benchmark" in item.keywords
+    run_benchmark = item.config.getoption("--benchmark")
     js_is_plugged_in = "joystick_plugged_in" in item.keywords
     run_interactive = item.config.getoption("--interactive")
     run_with_joystick = item.config.getoption("--joystick") is not False
@@ -30,3 +70,72 @@ def pytest_runtest_setup(item):
 
     if js_is_plugged_in and not run_with_joystick:
         pytest.skip("needs --joystick option to run")
+
+    if is_benchmark and not run_benchmark:
+        pytest.skip("needs --benchmark option to run")
+    if not is_benchmark and run_benchmark:
+        pytest.skip("skipping non benchmark")
+
+
+@pytest.fixture(scope="session")
+def benchmark_baseline(request):
+    path = request.config.getoption("--benchmark-baseline")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+@pytest.fixture
+def benchmark(request, benchmark_baseline):
+    """Times func, best of a few rounds, and compares it to the baseline.
+
+    Rounds repeat func often enough to take at least min_time, the result is
+    seconds per call.
+    """
+    tolerance = request.config.getoption("--benchmark-tolerance")
+
+    def run(func, name="", rounds=5, min_time=0.05):
+        key = request.node.name + (":" + name if name else "")
+        loops = 1
+        while True:
+            started = perf_counter()
+            for _ in range(loops):
+                func()
+            if perf_counter() - started >= min_time:
+                break
+            loops *= 2
+
+        timings = []
+        for _ in range(rounds):
+            started = perf_counter()
+            for _ in range(loops):
+                func()
+            timings.append((perf_counter() - started) / loops)
+
+        best = benchmark_results[key] = min(timings)
+        baseline = benchmark_baseline.get(key)
+        if baseline and best > baseline * (1 + tolerance):
+            pytest.fail(f"{key}: {best * 1e6:.1f}us per call, baseline {baseline * 1e6:.1f}us")
+        return best
+
+    return run
+
+
+def pytest_sessionfinish(session):
+    if not benchmark_results:
+        return
+    path = session.config.getoption("--benchmark-baseline")
+    baseline = {}
+    if os.path.exists(path):
+        with open(path) as file:
+            baseline = json.load(file)
+    if session.config.getoption("--benchmark-save"):
+        baseline.update(benchmark_results)
+    elif benchmark_results.keys() <= baseline.keys():
+        return
+    else:
+        baseline = {**benchmark_results, **baseline}
+    with open(path, "w") as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+        file.write("\n")
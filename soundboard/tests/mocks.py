@@ -9,11 +9,11 @@ class NOPMixer(SDLMixer):
         super().__init__()
         self.played = []
 
-    def play(self, chunk):
+    def play(self, chunk, options=None):
         self.played.append(chunk)
-        if sdlmixer.Mix_PlayChannel(-1, chunk, 0) == -1:
-            raise Exception("Could not play chunk")
+        played = super().play(chunk, options)
         sdlmixer.Mix_HaltChannel(-1)
+        return played
 
 
 class MockSound(Sound):
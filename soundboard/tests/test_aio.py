@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import pytest
+
+from soundboard.controls import ControlHandler
+from soundboard.controls import Joystick
+from soundboard.controls.raw_controls import EventQueue
+from soundboard.enums import EventTypes
+from soundboard.utils import bitmask
+
+aio = pytest.importorskip("soundboard.aio")
+
+
+def test_control_wakes_up_on_queue():
+    async def poll():
+        queue = EventQueue()
+        control = ControlHandler()
+        control.register_controler(Joystick(queue, backend="queue"))
+        async_control = aio.AsyncControl(control, asyncio.get_running_loop())
+        assert not any(await async_control.poll_buffered(0.35, timeout=0.01))
+
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, queue.put, (5, EventTypes.push.value))
+        loop.call_later(0.06, queue.put, (5, EventTypes.release.value))
+        start = time.monotonic()
+        state = await async_control.poll_buffered(0.35, timeout=1)
+        async_control.close()
+        return state, time.monotonic() - start
+
+    state, elapsed = asyncio.run(poll())
+    assert elapsed < 0.3
+    assert state.pushed == bitmask([5])
+
+
+class Client:
+    cacheme = True
+
+    def __init__(self):
+        self.next_update = time.time()
+        self.fetched = 0
+
+    def update(self):
+        self.fetched += 1
+        self.next_update = time.time() + 0.05
+
+    def backoff(self):
+        pass
+
+
+def test_api_manager_refreshes_on_timers():
+    client = Client()
+
+    async def refresh():
+        manager = aio.AsyncApiManager(asyncio.get_running_loop(), instances={Client: client}, workers=1)
+        manager.start()
+        await asyncio.sleep(0.2)
+        manager.stop()
+
+    asyncio.run(refresh())
+    assert 2 <= client.fetched <= 5
+
+
+def test_http_remote_input():
+    from aiohttp.test_utils import TestClient
+    from aiohttp.test_utils import TestServer
+
+    class Board:
+        shared_online = {"memes": None}
+
+    async def request():
+        app = aio.create_app(Board())
+        async with TestClient(TestServer(app)) as client:
+            index = await (await client.get("/")).json()
+            response = await client.post("/remote-input/3/1")
+            return index, response.status, app["queue"].get_nowait()
+
+    index, status, event = asyncio.run(request())
+    assert index == {"sound_sets": ["memes"]}
+    assert status == 200
+    assert event == (3, 1)
@@ -1,3 +1,5 @@
+import pytest
+
 from soundboard.client_api import JSONApi
 
 HTTPBIN_URL = "httpbin.org/response-headers"
@@ -12,3 +14,104 @@ def test_json(httpbin):
 
     even_more_js_api = JSONApi(url, herp="derp")
     assert js_api is not even_more_js_api
+
+
+def test_cached_never_fetches(monkeypatch):
+    from datetime import datetime
+    from datetime import timedelta
+
+    from soundboard.client_api import DepartureApi
+
+    api = DepartureApi("http://localhost:1/schedule", line="n1")
+    monkeypatch.setattr(api, "fetch_update", lambda: pytest.fail("fetched on the play path"))
+    assert api.cached().status == api.UNAVAILABLE
+    assert api.stale
+
+    leaves = datetime.now() + timedelta(minutes=10)
+    content = {"line": "n1", "hours": leaves.hour, "minutes": leaves.minute}
+    monkeypatch.setattr(api, "fetch_update", lambda: (content, api.OK))
+    api.update()
+    assert api.cached().data is content
+    assert not api.stale
+    assert api.next_update <= leaves.timestamp()
+
+    monkeypatch.setattr(api, "fetch_update", lambda: (None, api.TIMEOUT))
+    api.update()
+    assert api.cached().data is content  # stale while revalidating
+
+    api.expires = 0
+    assert api.cached().status == api.UNAVAILABLE
+    assert DepartureApi("http://localhost:1/schedule", line="n1").timestamp == api.timestamp
+
+
+def test_failed_first_fetch_is_unavailable(monkeypatch):
+    from soundboard.client_api import DepartureApi
+
+    api = DepartureApi("http://localhost:1/failing", line="n2")
+    monkeypatch.setattr(api, "fetch_update", lambda: (None, api.DISCONNECTED))
+    api.update()
+    assert api.status == api.DISCONNECTED
+    assert api.cached().status == api.UNAVAILABLE
+
+
+def test_manager_schedules_concurrently():
+    import threading
+    import time
+
+    from soundboard.client_api import ApiClient
+    from soundboard.client_api import ApiManager
+
+    class SlowApi(ApiClient):
+        started = threading.Barrier(3, timeout=5)
+
+        def fetch_update(self):
+            self.started.wait()
+            return {"url": self.url}, self.OK
+
+    manager = ApiManager(instances={}, workers=3)
+    manager.start()
+    clients = [SlowApi("slow-%d" % i, _interval=60) for i in range(3)]
+    deadline = time.time() + 5
+    while any(client.failures or client.timestamp < 1 for client in clients) and time.time() < deadline:
+        time.sleep(0.01)
+    assert all(client.cached().status == client.OK for client in clients)
+    assert all(client.next_update > client.timestamp for client in clients)
+    manager.stop()
+
+
+def test_revalidation(httpbin):
+    js_api = JSONApi(httpbin.url + "/etag/soundboard")
+    js_api.update()
+    first = js_api.cached().data
+    assert js_api.validators == {"If-None-Match": "soundboard"}
+    js_api.update()
+    assert js_api.cached().data is first
+
+
+def test_response_cache(tmp_path, monkeypatch):
+    from soundboard.client_api import ApiClient
+    from soundboard.client_api import instances
+    from soundboard.client_api import response_cache
+
+    class WarmApi(ApiClient):
+        def fetch_update(self):
+            return {"temp": 21.37}, self.OK
+
+    path = str(tmp_path / "api.json")
+    response_cache.open(path, 60)
+    api = WarmApi("warm", city="warsaw")
+    api.update()
+
+    instances.clear()
+    response_cache.open(path, 60)
+    monkeypatch.setattr(WarmApi, "fetch_update", lambda self: pytest.fail("fetched after restart"))
+    restarted = WarmApi("warm", city="warsaw")
+    assert restarted is not api
+    assert restarted.cached() == (api.cached().data, api.OK)
+    assert restarted.timestamp == api.timestamp and not restarted.stale
+
+    instances.clear()
+    response_cache.open(path, 0)
+    assert WarmApi("warm", city="warsaw").cached().status == api.UNAVAILABLE
+    instances.clear()
+    response_cache.open(None, 0)
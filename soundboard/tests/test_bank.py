@@ -0,0 +1,41 @@
+import shutil
+
+from soundboard import bank
+
+from .mocks import NOPMixer
+
+directory = "soundboard/tests/testboard/files"
+
+
+def test_bank(tmp_path):
+    mixer = NOPMixer()
+    path = str(tmp_path / "samples.bank")
+    assert bank.build(directory, path, mixer) == 5
+
+    packed = bank.Bank.open(path, directory, mixer.spec())
+    sample = directory + "/test/test.wav"
+    entry = packed.lookup(sample, mixer.manifest.info(sample).hash)
+    chunk, _ = packed.load(entry)
+    assert mixer.pcm(chunk) == mixer.pcm(mixer.read(directory + "/test/test.wav").raw)
+
+
+def test_bank_for_other_format(tmp_path):
+    mixer = NOPMixer()
+    path = str(tmp_path / "samples.bank")
+    bank.build(directory, path, mixer)
+    spec = mixer.spec()._replace(frequency=8000)
+    assert bank.Bank.open(path, directory, spec) is None
+
+
+def test_bank_skips_changed_samples(tmp_path):
+    mixer = NOPMixer()
+    samples = tmp_path / "files"
+    shutil.copytree(directory, str(samples))
+    path = str(tmp_path / "samples.bank")
+    bank.build(str(samples), path, mixer)
+    packed = bank.Bank.open(path, str(samples), mixer.spec())
+
+    sample = samples / "test" / "test.wav"
+    assert packed.lookup(str(sample), mixer.manifest.info(str(sample)).hash)
+    sample.write_bytes(sample.read_bytes() + b"\0\0\0\0")
+    assert packed.lookup(str(sample), mixer.manifest.info(str(sample)).hash) is None
@@ -0,0 +1,113 @@
+import pytest
+import yaml
+
+from .mocks import NOPMixer
+from soundboard.client_api import ApiClient
+from soundboard.config import settings
+from soundboard.config import YAMLConfig
+from soundboard.controls import ControlHandler
+from soundboard.controls import Joystick
+from soundboard.controls.raw_controls import EventQueue
+from soundboard.enums import EventTypes
+from soundboard.sounds import SoundFactory
+from soundboard.sounds import SoundSet
+from soundboard.types import event_tuple
+from soundboard.utils import bitmask
+from soundboard.utils import bits
+from soundboard.vox import voxify
+
+pytestmark = pytest.mark.benchmark
+
+FILES = "soundboard/tests/testboard/files/"
+SOUNDS = 300
+
+
+@pytest.fixture(scope="module")
+def large_set(tmp_path_factory):
+    sounds = [
+        {"name": "sound %d" % i, "keys": list(bits(i)), "type": "simple", "path": "test/test.wav"}
+        for i in range(1, SOUNDS + 1)
+    ]
+    data = {
+        "name": "benchmark",
+        "keys": [20],
+        "wav_directory": FILES,
+        "delay_constant": 0,
+        "delay_multiplier": 0,
+        "sounds": sounds,
+    }
+    path = tmp_path_factory.mktemp("yaml") / "large.yaml"
+    path.write_text(yaml.safe_dump(data))
+    return str(path)
+
+
+def test_voxify(benchmark):
+    sentence = "topside temperature is 21.37 degrees sub zero " * 20
+    benchmark(lambda: voxify(sentence))
+
+
+def test_to_state(benchmark):
+    events = [
+        event_tuple(i % 16, EventTypes.push if i % 2 else EventTypes.release, i)
+        for i in range(100)
+    ]
+    benchmark(lambda: ControlHandler.to_state(events))
+
+
+def test_poll_buffered(benchmark):
+    queue = EventQueue()
+    handler = ControlHandler()
+    handler.register_controler(Joystick(queue, backend="queue"))
+
+    def press():
+        for button in (1, 2, 3):
+            queue.put((button, EventTypes.push.value))
+        for button in (1, 2, 3):
+            queue.put((button, EventTypes.release.value))
+        handler.poll_buffered(0)
+
+    benchmark(press)
+
+
+def test_yaml_loading(benchmark, large_set):
+    benchmark(lambda: YAMLConfig(large_set, settings=settings), min_time=0.2, rounds=3)
+
+
+def test_sound_set_play_stop(benchmark, large_set):
+    factory = SoundFactory(NOPMixer, FILES)
+    sound_set = SoundSet(config=YAMLConfig(large_set, settings=settings), base_sound_factory=factory)
+    for sound in sound_set.sounds.values():
+        sound.play = lambda is_async=False: None  # only the set's own dispatch is measured
+        sound.end = lambda: None
+        sound.running = True
+
+    combinations = list(range(1, SOUNDS + 1))
+
+    def play_all():
+        for buttons in combinations:
+            sound_set.play(buttons)
+
+    benchmark(play_all, name="play")
+    benchmark(lambda: sound_set.stop(bitmask(range(9))), name="stop")
+
+
+def test_mixer_read(benchmark):
+    mixer = NOPMixer()
+    path = FILES + "test/test.wav"
+
+    def cold():
+        mixer.cache.clear()
+        mixer.read(path)
+
+    benchmark(cold, name="cold")
+    benchmark(lambda: mixer.read(path), name="warm")
+
+
+def test_api_cache_hit(benchmark):
+    class BenchmarkApi(ApiClient):
+        def fetch_update(self):
+            return {"main": {"temp": 21.37}}, self.OK
+
+    api = BenchmarkApi("benchmark")
+    api.update()
+    benchmark(api.cached)
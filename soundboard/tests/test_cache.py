@@ -0,0 +1,50 @@
+from collections import namedtuple
+
+from soundboard.cache import SampleCache
+
+entry = namedtuple("entry", "chunk duration size")
+
+
+def loader(name, size=10):
+    return lambda: entry(name, 0, size)
+
+
+def test_hits_and_misses():
+    cache = SampleCache(100)
+    assert cache.get("a", loader("a")).chunk == "a"
+    assert cache.get("a", loader("b")).chunk == "a"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_eviction():
+    freed = []
+    cache = SampleCache(25, free=freed.append)
+    cache.get("a", loader("a"))
+    cache.get("b", loader("b"))
+    cache.get("a", loader("a"))
+    cache.get("c", loader("c"))
+    assert freed == ["b"]
+    assert "a" in cache and "c" in cache
+    assert cache.size == 20
+
+
+def test_used_chunks_are_kept():
+    freed = []
+    cache = SampleCache(15, free=freed.append)
+    with cache.use("a", loader("a")) as used:
+        cache.get("b", loader("b"))
+        cache.get("c", loader("c"))
+        assert used.chunk == "a" and "a" in cache
+    assert freed == ["b"]
+    cache.get("d", loader("d"))
+    assert freed == ["b", "a", "c"]
+
+
+def test_playing_chunks_are_kept():
+    freed = []
+    cache = SampleCache(15, free=freed.append, in_use=lambda chunk: chunk == "a")
+    cache.get("a", loader("a"))
+    cache.get("b", loader("b"))
+    cache.get("c", loader("c"))
+    assert freed == ["b"]
+    assert "a" in cache
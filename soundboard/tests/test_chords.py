@@ -0,0 +1,92 @@
+from time import monotonic
+
+from soundboard.controls import ControlHandler
+from soundboard.controls.chords import SequenceDetector
+from soundboard.controls.chords import WindowDetector
+from soundboard.enums import EventTypes
+from soundboard.types import event_tuple
+from soundboard.utils import bitmask
+
+push, release = EventTypes.push, EventTypes.release
+
+
+def feed(detector, events, held=0):
+    """Adds events until the deadline or an early fire, returns how many were taken."""
+    detector.start(events[0].timestamp, 0.3)
+    for taken, event in enumerate(events, 1):
+        if event.timestamp >= detector.deadline:
+            return taken - 1
+        detector.add([event])
+        if detector.ready(held):
+            return taken
+    return len(events)
+
+
+def test_window_ends_after_release():
+    detector = WindowDetector()
+    events = [
+        event_tuple(1, push, 0),
+        event_tuple(2, push, 0.01),
+        event_tuple(1, release, 0.1),
+        event_tuple(2, release, 0.12),
+        event_tuple(3, push, 0.2),
+    ]
+    assert feed(detector, events) == 4
+    assert detector.pushed == detector.released == bitmask([1, 2])
+    assert detector.deadline == 0.1 + detector.release_window
+
+
+def test_sequence_follows_clicks():
+    detector = SequenceDetector()
+    events = [
+        event_tuple(1, push, 0),
+        event_tuple(1, release, 0.1),
+        event_tuple(2, push, 0.35),
+        event_tuple(2, release, 0.45),
+        event_tuple(3, push, 0.8),
+    ]
+    assert feed(detector, events) == 4
+    assert detector.pushed & detector.released == bitmask([1, 2])
+
+
+def test_early_fire_on_final_combination():
+    finals = {bitmask([1]), bitmask([2, 3])}
+    detector = WindowDetector(complete=lambda clicks, held: held == 0 and clicks in finals)
+    events = [event_tuple(1, push, 0), event_tuple(1, release, 0.01), event_tuple(2, push, 0.02)]
+    assert feed(detector, events) == 2
+    assert not detector.ready(held=bitmask([5]))
+
+    # a button still down means the chord may grow
+    events = [event_tuple(2, push, 0), event_tuple(3, push, 0.01), event_tuple(2, release, 0.02)]
+    assert feed(detector, events) == 3
+    assert not detector.ready(0)
+
+
+def test_debounce():
+    detector = WindowDetector(debounce=0.02)
+    detector.start(0, 0.3)
+    detector.add([event_tuple(1, push, 0), event_tuple(1, release, 0.005), event_tuple(1, push, 0.01)])
+    assert detector.pushed == bitmask([1])
+    assert detector.released == 0
+
+    # bouncing after the release was resolved drops the whole press
+    detector.add([event_tuple(1, release, 0.1)])
+    detector.start(0.2, 0.3)
+    detector.add([event_tuple(1, push, 0.11), event_tuple(1, release, 0.15)])
+    assert detector.pushed == detector.released == 0
+    detector.add([event_tuple(1, push, 0.5)])
+    assert detector.pushed == bitmask([1])
+
+
+def test_handler_fires_early():
+    handler = ControlHandler(WindowDetector(complete=lambda clicks, held: True))
+    handler.register_controler(type("Instant", (), {
+        "poll_raw": lambda self: [event_tuple(4, push, monotonic()), event_tuple(4, release, monotonic())],
+        "fileno": lambda self: None,
+        "generation": 0,
+        "pending": False,
+    })())
+    start = monotonic()
+    state = handler.poll_buffered(10, timeout=0)
+    assert monotonic() - start < 1
+    assert state.pushed == bitmask([4])
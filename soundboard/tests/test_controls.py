@@ -1,10 +1,15 @@
+import time
+
 import pytest
 
 from queue import Queue
 from soundboard.controls import ControlHandler
 from soundboard.controls import Joystick
+from soundboard.controls.raw_controls import EventQueue
 from soundboard.enums import EventTypes
 from soundboard.types import event_tuple
+from soundboard.utils import bitmask
+from soundboard.utils import bits
 
 joystick_plugged_in = pytest.mark.joystick_plugged_in
 
@@ -30,6 +35,40 @@ def test_controls():
     ch = ControlHandler()
     ch.register_controler(j)
     states_tuple = ch.poll_buffered(0)
-    assert states_tuple.pushed == frozenset([123])
-    assert states_tuple.released == frozenset([])
-    assert states_tuple.held == frozenset([100])
+    assert states_tuple.pushed == bitmask([123])
+    assert states_tuple.released == 0
+    assert states_tuple.held == bitmask([100])
+
+
+def test_controls_wake_up_on_queue():
+    evt_queue = EventQueue()
+    j = Joystick(evt_queue, backend='queue')
+    ch = ControlHandler()
+    ch.register_controler(j)
+    assert not any(ch.poll_buffered(0.35, timeout=0.01))
+
+    evt_queue.put((5, EventTypes.push.value))
+    evt_queue.put((5, EventTypes.release.value))
+    start = time.monotonic()
+    states_tuple = ch.poll_buffered(0.35, timeout=1)
+    assert time.monotonic() - start < 0.3
+    assert states_tuple.pushed == bitmask([5])
+
+
+def test_click_release_is_not_delayed():
+    evt_queue = EventQueue()
+    ch = ControlHandler()
+    ch.register_controler(Joystick(evt_queue, backend='queue'))
+    evt_queue.put((5, EventTypes.push.value))
+    evt_queue.put((5, EventTypes.release.value))
+    assert ch.poll_buffered(0.05, timeout=1).pushed == bitmask([5])
+
+    start = time.monotonic()
+    states_tuple = ch.poll_buffered(0.05, timeout=1)
+    assert time.monotonic() - start < 0.1
+    assert states_tuple.released == bitmask([5])
+
+
+def test_bitmask():
+    assert bitmask([0, 3]) == 0b1001
+    assert list(bits(bitmask([0, 3, 64]))) == [0, 3, 64]
@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from soundboard.dispatcher import Dispatcher
+from soundboard.enums import Priority
+from soundboard.exceptions import PlaybackBusy
+from soundboard.signals import sound_stopped
+
+
+class CountingSound:
+    def __init__(self):
+        self.plays = 0
+
+    def play(self, is_async=False):
+        self.plays += 1
+
+
+def test_priority_and_backpressure():
+    dispatcher = Dispatcher(max_pending=2, coalesce=10)
+    gate = threading.Event()
+    order = []
+    dispatcher.submit(gate.wait)  # keeps the dispatcher busy
+
+    sound, other = CountingSound(), CountingSound()
+    first = dispatcher.play(sound)
+    assert dispatcher.play(sound) is first  # coalesced
+    dispatcher.submit(lambda: order.append("remote"), Priority.remote)
+    with pytest.raises(PlaybackBusy):
+        dispatcher.play(other)
+    last = dispatcher.submit(lambda: order.append("local"))
+
+    gate.set()
+    last.result(timeout=5)
+    first.result(timeout=5)
+    assert order == ["local"] or order == ["local", "remote"]
+    assert sound.plays == 1 and other.plays == 0
+    dispatcher.stop()
+
+
+class LongSound:
+    def __init__(self):
+        self.playing = Future()
+
+    def play(self, is_async=False):
+        return self.playing
+
+
+def test_remote_slots_last_until_playback_ends():
+    dispatcher = Dispatcher(max_pending=1, coalesce=0)
+    sound = LongSound()
+    dispatcher.play(sound).result(timeout=5)
+    with pytest.raises(PlaybackBusy):
+        dispatcher.play(CountingSound())
+
+    sound.playing.set_result(True)
+    other = CountingSound()
+    dispatcher.play(other).result(timeout=5)
+    assert other.plays == 1
+    dispatcher.stop()
+
+
+def test_remote_slots_are_released_when_stopped():
+    dispatcher = Dispatcher(max_pending=1, coalesce=0)
+    sound = LongSound()
+    dispatcher.play(sound).result(timeout=5)
+    with pytest.raises(PlaybackBusy):
+        dispatcher.play(CountingSound())
+
+    sound_stopped.send(sound)
+    other = CountingSound()
+    dispatcher.play(other).result(timeout=5)
+    assert other.plays == 1
+    # the stopped playback ending later does not free a slot twice
+    sound.playing.set_result(True)
+    assert dispatcher.pending == 0
+    dispatcher.stop()
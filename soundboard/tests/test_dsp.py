@@ -0,0 +1,60 @@
+import pytest
+from sdl2.audio import AUDIO_S16SYS
+
+from soundboard.types import audio_spec
+
+np = pytest.importorskip("numpy")
+dsp = pytest.importorskip("soundboard.dsp")
+
+spec = audio_spec(1000, AUDIO_S16SYS, 1)
+
+
+def pcm(*samples):
+    return np.array(samples, dtype=np.int16).tobytes()
+
+
+def test_trim():
+    processor = dsp.SampleProcessor(trim=-40)
+    processed = processor.process(pcm(0, 10, 1000, -2000, 5, 0), spec)
+    assert np.frombuffer(processed, np.int16).tolist() == [1000, -2000]
+
+
+def test_peak_normalization():
+    processor = dsp.SampleProcessor(normalize="peak", level=0)
+    processed = np.frombuffer(processor.process(pcm(0, 8192, -16384), spec), np.int16)
+    assert processed.tolist() == [0, 16384, -32768]
+
+
+def test_disk_cache(tmp_path):
+    processor = dsp.SampleProcessor(str(tmp_path), trim=-40)
+    assert processor.duration("hash", spec) is None
+    assert processor.load("hash", spec, lambda: pcm(0, 1000, 0)) == pcm(1000)
+    assert processor.load("hash", spec, lambda: pytest.fail("decoded twice")) == pcm(1000)
+    assert processor.duration("hash", spec) == 0.001
+
+
+def test_resample():
+    t = np.arange(22050) / 22050
+    tone = np.sin(2 * np.pi * 1000 * t).astype(np.float32)[:, None]
+    resampled = dsp.resample(tone, 22050, 44100)
+    assert resampled.shape == (44100, 1)
+    spectrum = np.abs(np.fft.rfft(resampled[:, 0]))
+    assert spectrum.argmax() == 1000  # 1 Hz bins over one second
+
+
+def test_convert_24_bit(tmp_path):
+    import wave
+
+    path = str(tmp_path / "24.wav")
+    with wave.open(path, "wb") as wave_file:
+        wave_file.setnchannels(2)
+        wave_file.setsampwidth(3)
+        wave_file.setframerate(500)
+        # left at half scale, right at minus half scale
+        wave_file.writeframes(b"\x00\x00\x40\x00\x00\xc0" * 500)
+
+    processor = dsp.SampleProcessor(resample=True)
+    data = processor.load("hash", spec, lambda: pytest.fail("decoded by the mixer"), source=path)
+    converted = np.frombuffer(data, np.int16)
+    assert len(converted) == 1000
+    assert abs(converted[100:900]).max() < 64  # mono downmix cancels out
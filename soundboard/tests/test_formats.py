@@ -0,0 +1,59 @@
+import struct
+
+import pytest
+
+from soundboard import formats
+from soundboard.exceptions import SoundException
+
+
+def ogg_page(granule, packet=b""):
+    header = b"OggS" + bytes([0, 2]) + struct.pack("<qIII", granule, 1, 0, 0)
+    return header + bytes([1, len(packet)]) + packet
+
+
+def test_wav():
+    info = formats.probe("soundboard/tests/testboard/files/test/test.wav")
+    assert info.rate and info.channels and info.duration > 0
+
+
+def test_flac(tmp_path):
+    # 44.1 kHz, stereo, 16 bit, 88200 samples
+    packed = (44100 << 44) | (1 << 41) | (15 << 36) | 88200
+    streaminfo = bytes(10) + struct.pack(">Q", packed) + bytes(16)
+    path = tmp_path / "a.flac"
+    path.write_bytes(b"fLaC" + bytes([0x80, 0, 0, 34]) + streaminfo)
+    assert formats.probe(str(path)) == (2.0, 44100, 2)
+
+
+def test_ogg(tmp_path):
+    vorbis = b"\x01vorbis" + struct.pack("<IBI", 0, 1, 22050) + bytes(15)
+    path = tmp_path / "a.ogg"
+    path.write_bytes(ogg_page(0, vorbis) + bytes(1000) + ogg_page(11025))
+    assert formats.probe(str(path)) == (0.5, 22050, 1)
+
+    opus = b"OpusHead" + struct.pack("<BBHIhB", 1, 2, 312, 44100, 0, 0)
+    path.write_bytes(ogg_page(0, opus) + ogg_page(48312))
+    assert formats.probe(str(path)) == (1.0, 44100, 2)
+
+
+def test_unsupported(tmp_path):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(b"ID3\x03" + bytes(100))
+    with pytest.raises(SoundException):
+        formats.probe(str(path))
+
+
+def test_corrupt(tmp_path):
+    path = tmp_path / "a.flac"
+    path.write_bytes(b"fLaC" + bytes(3))
+    with pytest.raises(SoundException):
+        formats.probe(str(path))
+
+
+def test_bad_file_is_a_sound_exception(tmp_path):
+    from .mocks import NOPMixer
+    from soundboard.sounds import SoundFactory
+
+    (tmp_path / "bad.wav").write_bytes(b"RIFF" + bytes(40))
+    with pytest.raises(SoundException):
+        SoundFactory(NOPMixer, str(tmp_path)).simple("bad.wav")
@@ -0,0 +1,31 @@
+from time import monotonic
+
+from prometheus_client import REGISTRY
+
+from .test_player import RecordingMixer
+from .test_player import sample
+from soundboard import latency
+from soundboard.dispatcher import Dispatcher
+from soundboard.player import Player
+
+
+def test_trace_follows_the_press():
+    player = Player(RecordingMixer())
+    dispatcher = Dispatcher()
+
+    def dispatched():
+        trace = latency.mark("dispatched")
+        trace.sound_set = "traced"
+        return player.play([sample("a", 0), sample("b", 0)])
+
+    latency.start(monotonic() - 0.01).mark("resolved")
+    playing = dispatcher.submit(dispatched).result(timeout=1)
+    playing.result(timeout=1)
+    dispatcher.stop()
+
+    trace = latency.traces()[-1]
+    assert trace["sound_set"] == "traced"
+    assert list(trace["stages"]) == ["resolved", "dispatched", "played"]
+    assert trace["stages"]["played"] >= 0.01
+    count = REGISTRY.get_sample_value("soundboard_press_seconds_count", {"sound_set": "traced"})
+    assert count == 1
@@ -0,0 +1,61 @@
+import os
+import wave
+
+import pytest
+
+from soundboard.manifest import Manifest
+
+
+def write_wav(path, frames=800, rate=8000):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\0\0" * frames)
+
+
+@pytest.fixture
+def sample(tmp_path):
+    path = tmp_path / "sample.wav"
+    write_wav(path)
+    return str(path)
+
+
+def test_probe(sample):
+    info = Manifest().info(sample)
+    assert info.duration == 0.1
+    assert (info.rate, info.channels) == (8000, 1)
+
+
+def test_unchanged_files_are_not_probed(tmp_path, sample, monkeypatch):
+    manifest_path = str(tmp_path / "manifest.json")
+    manifest = Manifest(manifest_path)
+    info = manifest.info(sample)
+    manifest.save()
+    assert not manifest.dirty
+
+    def probe(*args):
+        raise AssertionError("probed unchanged file")
+
+    monkeypatch.setattr(Manifest, "probe", staticmethod(probe))
+    assert Manifest(manifest_path).info(sample) == info
+
+
+def test_changed_files_are_probed_again(sample):
+    manifest = Manifest()
+    info = manifest.info(sample)
+    write_wav(sample, frames=1600)
+    os.utime(sample, ns=(0, info.mtime + 1))
+    assert manifest.info(sample).duration == 0.2
+
+
+def test_duplicates_and_prune(tmp_path, sample):
+    copy = tmp_path / "copy.wav"
+    write_wav(copy)
+    manifest = Manifest()
+    assert manifest.info(sample).hash == manifest.info(str(copy)).hash
+    assert len(manifest.duplicates()) == 1
+
+    os.remove(str(copy))
+    assert manifest.prune() == [os.path.realpath(str(copy))]
+    assert not manifest.duplicates()
@@ -0,0 +1,53 @@
+from collections import namedtuple
+from contextlib import contextmanager
+
+import pytest
+
+from soundboard.player import Player
+
+
+class sample(namedtuple("sample", "raw duration")):
+    @contextmanager
+    def use(self):
+        yield self.raw
+
+
+class RecordingMixer:
+    def __init__(self):
+        self.played = []
+
+    def play(self, chunk, options=None):
+        if chunk == "ignored":
+            return False
+        if chunk == "broken":
+            raise Exception("Could not play chunk")
+        self.played.append(chunk)
+
+
+def test_voice_plays_in_order():
+    mixer = RecordingMixer()
+    player = Player(mixer)
+    first = player.play([sample("a", 0), sample("b", 0)], voice="main")
+    second = player.play([sample("c", 0)], voice="main")
+    assert second.result(timeout=1)
+    assert first.done()
+    assert mixer.played == ["a", "b", "c"]
+    assert not player.busy("main")
+
+
+def test_errors_reach_the_future():
+    mixer = RecordingMixer()
+    player = Player(mixer)
+    failed = player.play([sample("broken", 0), sample("a", 0)], voice="main")
+    ok = player.play([sample("b", 0)], voice="main")
+    with pytest.raises(Exception):
+        failed.result(timeout=1)
+    assert ok.result(timeout=1)
+    assert mixer.played == ["b"]
+
+
+def test_ignored_sequences_are_dropped():
+    mixer = RecordingMixer()
+    player = Player(mixer)
+    assert player.play([sample("ignored", 0), sample("a", 0)]).result(timeout=1) is False
+    assert mixer.played == []
@@ -0,0 +1,89 @@
+from queue import Queue
+
+from soundboard.controls import Joystick
+from soundboard.controls.replay import Recorder
+from soundboard.controls.replay import read_recording
+from soundboard.controls.replay import replay
+from soundboard.controls.replay import resolve
+from soundboard.enums import EventTypes
+from soundboard.types import event_tuple
+from soundboard.types import states_tuple
+from soundboard.utils import bitmask
+
+push, release = EventTypes.push, EventTypes.release
+BUFFERS = (0.05, 0.05)
+# chord of 1 and 2, then 3 on its own
+EVENTS = [
+    event_tuple(1, push, 10.0),
+    event_tuple(2, push, 10.01),
+    event_tuple(1, release, 10.2),
+    event_tuple(2, release, 10.21),
+    event_tuple(3, push, 10.5),
+    event_tuple(3, release, 10.6),
+]
+
+
+def record(path, events=EVENTS):
+    recorder = Recorder(str(path))
+    recorder.write(events)
+    recorder.close()
+    return str(path)
+
+
+def test_recorder_attaches_to_joystick(tmp_path):
+    queue = Queue()
+    joystick = Joystick(queue, backend="queue")
+    recorder = Recorder(str(tmp_path / "input.rec"))
+    recorder.attach(joystick)
+    queue.put((7, push.value, 5.0))
+    queue.put((7, release.value, 5.5))
+    assert len(joystick.poll_raw()) == 2
+    recorder.close()
+
+    assert read_recording(recorder.path) == [event_tuple(7, push, 0), event_tuple(7, release, 0.5)]
+
+
+def test_resolve():
+    states = resolve(EVENTS, BUFFERS)
+    assert states == [
+        states_tuple(0, 0, bitmask([1, 2])),
+        states_tuple(0, bitmask([1, 2]), 0),
+        states_tuple(0, 0, bitmask([3])),
+        states_tuple(0, bitmask([3]), 0),
+    ]
+
+
+def test_resolve_click_release():
+    clicks = [event_tuple(4, push, 1.0), event_tuple(4, release, 1.01)]
+    assert resolve(clicks, BUFFERS) == [states_tuple(bitmask([4]), 0, 0), states_tuple(0, bitmask([4]), 0)]
+
+
+def test_replay_clicks(tmp_path):
+    events = []
+    for i in range(5):
+        events += [event_tuple(i, push, i * 0.2), event_tuple(i, release, i * 0.2 + 0.01)]
+    report = replay(record(tmp_path / "input.rec", events), speed=1, buffers=BUFFERS, timeout=0.3)
+    # each click and its deferred release
+    assert report.expected == report.resolved == 10
+    assert report.dropped == report.misresolved == 0
+    assert len(report.latencies) == 5
+
+
+def test_replay_at_recorded_pace(tmp_path):
+    report = replay(record(tmp_path / "input.rec"), speed=1, buffers=BUFFERS, timeout=0.3)
+    assert report.events == 6
+    assert report.expected == report.resolved == 4
+    assert report.dropped == report.misresolved == 0
+    assert 0.6 <= report.seconds < 1.5
+    assert all(latency < 0.2 for latency in report.latencies)
+
+
+def test_replay_as_fast_as_possible(tmp_path):
+    events = [event_tuple(i % 8, (push, release)[i // 8 % 2], i * 0.1) for i in range(160)]
+    report = replay(record(tmp_path / "input.rec", events), speed=0, buffers=BUFFERS)
+    assert report.events == 160
+    assert report.expected == 160
+    # everything arrives at once, chords of the recording merge
+    assert report.resolved < report.expected
+    assert report.dropped
+    assert "mis-resolved" in str(report)
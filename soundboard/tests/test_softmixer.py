@@ -0,0 +1,42 @@
+import time
+import wave
+
+import pytest
+
+softmixer = pytest.importorskip("soundboard.softmixer")
+
+
+def test_software_mixer(tmp_path):
+    output = str(tmp_path / "out.wav")
+    mixer = softmixer.SoftwareMixer(output=output, realtime=False, block_size=512)
+    sample = mixer.read("soundboard/tests/testboard/files/test/test.wav")
+    assert sample.raw.shape[1] == 2
+
+    mixer.play(sample.raw)
+    mixer.play(sample.raw)
+    assert mixer.is_playing(sample.raw)
+    deadline = time.monotonic() + 5
+    while mixer.is_playing(sample.raw) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert not mixer.is_playing(sample.raw)
+    assert mixer.stats["blocks"] >= len(sample.raw) // 512
+    with wave.open(output) as rendered:
+        assert rendered.getnframes() >= len(sample.raw)
+
+
+def test_offline_rendering_keeps_gaps(tmp_path):
+    softmixer.SoftwareMixer._instances.pop(softmixer.SoftwareMixer, None)
+    output = str(tmp_path / "out.wav")
+    mixer = softmixer.SoftwareMixer(output=output, realtime=False, block_size=512)
+    sample = mixer.read("soundboard/tests/testboard/files/test/test.wav")
+
+    start = time.monotonic()
+    # one second of silence after each sample
+    mixer.player.play([sample, sample], duration_const=1).result(timeout=5)
+    assert time.monotonic() - start < 1
+
+    rendered_seconds = mixer.clock()
+    frames = mixer._spec.frequency * (2 * (sample.duration + 1) - 2 * softmixer.settings.sound_sleep_offset)
+    assert abs(rendered_seconds * mixer._spec.frequency - frames) < 2 * 512
+    softmixer.SoftwareMixer._instances.pop(softmixer.SoftwareMixer, None)
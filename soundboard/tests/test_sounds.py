@@ -1,10 +1,14 @@
+import time
 from textwrap import dedent
+from typing import Dict
 
 import pytest
 
 from .mocks import NOPMixer
 from soundboard import sounds
 from soundboard.client_api import ApiManager
+from soundboard.config import settings
+from soundboard.config import YAMLConfig
 
 
 @pytest.fixture
@@ -15,6 +19,7 @@ def factory():
 class MockRequest:
 
     status_code = 200
+    headers: Dict[str, str] = {}
 
     @property
     def text(self):
@@ -43,8 +48,75 @@ def test_sounds(monkeypatch, factory):
     list.end()
     random = factory.random(["test/test2.wav", "test/test3.wav"])
     random.play()
-    monkeypatch.setattr("requests.get", lambda *args, **kwargs: MockRequest())
+    monkeypatch.setattr("requests.Session.get", lambda *args, **kwargs: MockRequest())
     _ = factory.weather("europe,warsaw")
     au = ApiManager()
     au.update()
     # assert weather.temperature == 21.37
+
+
+def test_vox_phrase_cache(factory):
+    first = factory.vox("Alpha  bravo")
+    second = factory.vox("alpha bravo")
+    assert first.samples[0].chunk is second.samples[0].chunk
+    words = [factory.simple("vox/%s.wav" % w).duration for w in ("alpha", "bravo")]
+    assert first.samples[0].duration <= sum(words)
+
+
+def test_api_announcement(monkeypatch, factory):
+    weather = factory.weather("prerender")
+    monkeypatch.setattr(weather, "to_sentence", lambda data: "alpha bravo")
+    data = {"main": {"temp": 21.37}}
+    monkeypatch.setattr(weather.api, "fetch_update", lambda: (dict(data), weather.api.OK))
+    weather.api.update()
+    rendered = weather.announcement
+
+    weather.api.update()  # same data, nothing to render
+    assert weather.announcement is rendered
+    monkeypatch.setattr(weather, "_vox", lambda sentence: pytest.fail("rendered on press"))
+    weather.play().result(timeout=5)
+
+
+def test_stream_from_yaml(tmp_path):
+    path = tmp_path / "stream.yaml"
+    path.write_text(dedent(
+        """
+        name: streams
+        keys: [5]
+        wav_directory: soundboard/tests/testboard/files/
+        sounds:
+            - name: track
+              keys: [0]
+              type: stream
+              path: test/test.wav
+        """,
+    ))
+    factory = sounds.SoundFactory(NOPMixer, "soundboard/tests/testboard/files/")
+    stream = sounds.SoundSet(config=YAMLConfig(str(path), settings=settings), base_sound_factory=factory)["track"]
+    assert stream.start == 0
+    assert stream.stop_on_release is False
+
+    sample = stream.samples[0]
+    stream.play()
+    deadline = time.monotonic() + 5
+    while not sample.playing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stream.end()  # the release of the click that started it
+    assert sample.playing
+    stream.play()  # clicked again
+    assert not sample.playing
+
+
+def test_stream(factory):
+    stream = factory.stream("test/test.wav")
+    stream.setup("test/test.wav", stop_on_release=True)
+    sample = stream.samples[0]
+    assert sample.duration == factory.simple("test/test.wav").duration
+
+    stream.play()
+    deadline = time.monotonic() + 5
+    while not sample.playing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sample.playing
+    stream.end()
+    assert not sample.playing
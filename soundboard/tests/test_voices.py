@@ -0,0 +1,40 @@
+from soundboard.enums import Overlap
+from soundboard.enums import StealPolicy
+from soundboard.types import play_options
+from soundboard.voices import VoiceAllocator
+
+
+def allocator(channels, policy=StealPolicy.oldest, loudness=None):
+    return VoiceAllocator(channels, policy, playing=lambda channel: True, loudness=loudness)
+
+
+def test_overlap():
+    voices = allocator(4)
+    assert voices.allocate("a", play_options(key="a")) == (0, [])
+    assert voices.allocate("a", play_options(overlap=Overlap.ignore, key="a")) is None
+    assert voices.allocate("a", play_options(overlap=Overlap.restart, key="a")) == (0, [0])
+    assert voices.allocate("a", play_options(key="a")) == (1, [])
+
+
+def test_group_cap_and_stealing():
+    voices = allocator(3)
+    voices.add_group("drums", 2)
+    for chunk in "abc":
+        voices.allocate(chunk, play_options(group="drums", key=chunk))
+    assert [v and v.chunk for v in voices.channels] == ["c", "b", None]
+
+    voices.allocate("x", play_options(key="x"))
+    assert voices.allocate("y", play_options(key="y")) == (1, [1])  # oldest overall
+
+
+def test_policies():
+    voices = allocator(2, StealPolicy.same_sound)
+    voices.allocate("a", play_options(key="a"))
+    voices.allocate("b", play_options(key="b"))
+    assert voices.allocate("b", play_options(key="b")) == (1, [1])
+
+    loudness = {0: 10, 1: 1}
+    voices = allocator(2, StealPolicy.quietest, loudness=loudness.get)
+    voices.allocate("a")
+    voices.allocate("b")
+    assert voices.allocate("c") == (1, [1])
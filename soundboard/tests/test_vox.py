@@ -1,3 +1,9 @@
+from array import array
+
+from sdl2.audio import AUDIO_S16SYS
+
+from soundboard.render import VoxRenderer
+from soundboard.types import audio_spec
 from soundboard.vox import voxify
 
 
@@ -5,3 +11,10 @@ def test_numbers():
     words = ["5", "thousand", "1", "hundred", "30"]
     paths = ["vox/%s.wav" % w for w in words]
     assert voxify("5130") == paths
+
+
+def test_trim():
+    spec = audio_spec(8000, AUDIO_S16SYS, 1)
+    renderer = VoxRenderer(mixer=None, threshold=10)
+    pcm = array("h", [100, -200, 5, -3, 0]).tobytes()
+    assert renderer.trim(pcm, spec) == pcm[:4]
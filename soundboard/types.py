@@ -1,16 +1,21 @@
-from typing import NamedTuple, FrozenSet, Any
+from typing import NamedTuple, Any, Optional
+from sdl2.audio import SDL_AUDIO_BITSIZE
 from .enums import EventTypes
+from .enums import Overlap
 
 
 class event_tuple(NamedTuple):
     button: int
     type: EventTypes
+    timestamp: float = 0
 
 
 class states_tuple(NamedTuple):
-    pushed: FrozenSet[int]
-    released: FrozenSet[int]
-    held: FrozenSet[int]
+    """Button bitmasks, bit n is set for button n."""
+
+    pushed: int
+    released: int
+    held: int
 
 
 class sound_state(NamedTuple):
@@ -21,3 +26,35 @@ class sound_state(NamedTuple):
 class api_state(NamedTuple):
     data: dict
     status: int
+
+
+class audio_spec(NamedTuple):
+    frequency: int
+    format: int
+    channels: int
+
+    @property
+    def frame_size(self):
+        return SDL_AUDIO_BITSIZE(self.format) // 8 * self.channels
+
+
+class sample_info(NamedTuple):
+    size: int
+    mtime: int
+    duration: float
+    rate: int
+    channels: int
+    hash: str
+
+
+class play_options(NamedTuple):
+    """How a sound claims mixer channels, key identifies the sound for overlap."""
+
+    group: Optional[str] = None
+    overlap: Overlap = Overlap.layer
+    key: Any = None
+
+
+class group_info(NamedTuple):
+    cap: int
+    policy: Any = None
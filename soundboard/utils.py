@@ -1,11 +1,30 @@
 import inspect
-from typing import Dict
+from typing import Dict, Iterable, Iterator
 
 import sdl2.ext
 from sdl2 import sdlmixer
 
 
-def init_sdl():
+AUDIO_FORMATS = {
+    "u8": sdl2.AUDIO_U8,
+    "s16": sdl2.AUDIO_S16SYS,
+    "s32": sdl2.AUDIO_S32SYS,
+    "f32": sdl2.AUDIO_F32SYS,
+}
+
+
+def audio_format(name):
+    if name not in AUDIO_FORMATS:
+        raise ValueError("unknown audio format %s, use one of %s" % (name, ", ".join(AUDIO_FORMATS)))
+    return AUDIO_FORMATS[name]
+
+
+def init_sdl(
+    frequency=sdlmixer.MIX_DEFAULT_FREQUENCY,
+    fmt=sdlmixer.MIX_DEFAULT_FORMAT,
+    channels=2,
+    buffer=1024,
+):
     initialized = getattr(init_sdl, "initialized", False)
     if initialized:
         return True
@@ -15,22 +34,33 @@ def init_sdl():
     sdl2.SDL_InitSubSystem(sdl2.SDL_INIT_JOYSTICK)
     sdl2.SDL_SetHint(sdl2.SDL_HINT_JOYSTICK_ALLOW_BACKGROUND_EVENTS, b"1")
 
-    result = (
-        sdlmixer.Mix_OpenAudio(
-            sdlmixer.MIX_DEFAULT_FREQUENCY, sdlmixer.MIX_DEFAULT_FORMAT, 2, 1024,
-        )
-        != -1
-    )
+    # load the compressed decoders up front instead of on the first sample
+    sdlmixer.Mix_Init(sdlmixer.MIX_INIT_OGG | sdlmixer.MIX_INIT_FLAC | sdlmixer.MIX_INIT_OPUS)
+    result = sdlmixer.Mix_OpenAudio(frequency, fmt, channels, buffer) != -1
     if result:
         setattr(init_sdl, "initialized", True)
     return result
 
 
+def bitmask(buttons: Iterable[int]) -> int:
+    mask = 0
+    for button in buttons:
+        mask |= 1 << button
+    return mask
+
+
+def bits(mask: int) -> Iterator[int]:
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
 def read_func_attributes(func):
     spec = inspect.getfullargspec(func)
     args = {arg: None for arg in spec.args}
     if spec.defaults:
-        defaults = {k: v for k, v in zip(reversed(spec.args), spec.defaults)}
+        defaults = {k: v for k, v in zip(reversed(spec.args), reversed(spec.defaults))}
     else:
         defaults = {}
     args.pop("self")  # TODO: do this better :3
@@ -0,0 +1,96 @@
+import logging
+from threading import Lock
+from time import monotonic
+from typing import Any
+from typing import NamedTuple
+
+from .enums import Overlap
+from .enums import StealPolicy
+from .types import group_info
+from .types import play_options
+
+logger = logging.getLogger("soundboard.voices")
+
+
+class voice_info(NamedTuple):
+    chunk: Any
+    group: str
+    key: Any
+    started: float
+
+
+class VoiceAllocator:
+    """Picks mixer channels for new chunks.
+
+    Overlap is resolved against channels playing the same key, then the
+    group cap and finally the channel count are enforced by stealing a
+    channel according to the group's (or the global) steal policy.
+    """
+
+    def __init__(self, channels, policy=StealPolicy.oldest, playing=None, loudness=None):
+        """
+        :param playing: playing(channel) tells if a channel is still busy
+        :param loudness: loudness(channel) for the quietest policy
+        """
+        self.channels = [None] * channels
+        self.policy = policy
+        self.playing = playing
+        self.loudness = loudness
+        self.groups = {}
+        self.stolen = 0
+        self.lock = Lock()
+
+    def add_group(self, name, cap, policy=None):
+        self.groups[name] = group_info(cap, policy)
+
+    def allocate(self, chunk, options=None):
+        """:rtype: (channel, channels to halt) or None when the chunk must not play"""
+        options = options or play_options()
+        with self.lock:
+            active = {
+                channel: voice
+                for channel, voice in enumerate(self.channels)
+                if voice and self.playing(channel)
+            }
+            same = [
+                channel for channel, voice in active.items()
+                if options.key is not None and voice.key == options.key
+            ]
+            if same and options.overlap is Overlap.ignore:
+                return None
+
+            halt = []
+            if options.overlap is Overlap.restart:
+                halt.extend(same)
+
+            group = self.groups.get(options.group)
+            if group and group.cap:
+                members = [c for c, v in active.items() if v.group == options.group and c not in halt]
+                if len(members) >= group.cap:
+                    halt.append(self._victim(members, active, options, group.policy))
+
+            free = [c for c in range(len(self.channels)) if c not in active or c in halt]
+            if free:
+                channel = free[0]
+            else:
+                channel = self._victim(list(active), active, options, None)
+                halt.append(channel)
+
+            for stolen in halt:
+                self.channels[stolen] = None
+            self.channels[channel] = voice_info(chunk, options.group, options.key, monotonic())
+            return channel, halt
+
+    def release(self, channel):
+        with self.lock:
+            self.channels[channel] = None
+
+    def _victim(self, candidates, active, options, policy):
+        policy = policy or self.policy
+        self.stolen += 1
+        if policy is StealPolicy.same_sound:
+            same = [c for c in candidates if options.key is not None and active[c].key == options.key]
+            candidates = same or candidates
+        elif policy is StealPolicy.quietest and self.loudness:
+            return min(candidates, key=lambda c: (self.loudness(c), active[c].started))
+        return min(candidates, key=lambda c: active[c].started)